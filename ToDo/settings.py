@@ -46,10 +46,12 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'myapp.middleware.RequestMetricsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'myapp.middleware.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -58,7 +60,8 @@ ROOT_URLCONF = 'ToDo.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates with render times reported by RequestMetricsMiddleware
+        'BACKEND': 'myapp.metrics.TimedDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -127,7 +130,9 @@ USE_TZ = True
 STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
-# Whitenoise configuration
+# Whitenoise configuration: collectstatic writes content-hashed copies of the
+# app's CSS/JS with gzip and brotli variants next to them, and WhiteNoise
+# serves the hashed names with a far-future immutable Cache-Control header
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 # Default primary key field type
@@ -166,3 +171,142 @@ if not DEBUG:
     SECURE_HSTS_PRELOAD = True
     SESSION_COOKIE_SECURE = True
     CSRF_COOKIE_SECURE = True
+
+# Serve sidebar counts from the denormalized per-user TodoCounters table
+TODO_COUNTER_TABLE = config('TODO_COUNTER_TABLE', default=True, cast=bool)
+
+# Route the task list views to their async versions (for ASGI servers such as uvicorn)
+TODO_ASYNC_VIEWS = config('TODO_ASYNC_VIEWS', default=False, cast=bool)
+
+# Push task changes to open pages over Server-Sent Events (needs the ASGI deployment)
+TODO_LIVE_UPDATES = config('TODO_LIVE_UPDATES', default=False, cast=bool)
+TODO_EVENT_TTL = 300  # seconds a change event stays available for replay
+TODO_EVENT_POLL_INTERVAL = 1  # seconds between checks for new events
+TODO_EVENT_STREAM_TIMEOUT = 300  # seconds before a stream closes and the browser reconnects
+
+# Days of delta sync history kept by the prune_todo_changes command; clients
+# with an older cursor are told to refetch everything
+TODO_CHANGE_LOG_RETENTION_DAYS = 30
+
+# Seconds a change log entry may take to commit. Ids are allocated before
+# commit, so a newer entry can become visible before an older one; sync
+# cursors never move past entries younger than this
+TODO_CHANGE_LOG_SETTLE_SECONDS = 5
+
+# Rows written per UPDATE by bulk updates of todos; an update of more rows
+# than this logs one reset per user instead of a change per todo
+TODO_UPDATE_CHUNK_SIZE = 1000
+
+# Email reminders sent by the send_reminders command (run it from cron, or
+# as a long-running worker with --loop)
+TODO_REMINDER_LEAD_MINUTES = 30  # how long before the due time to remind
+TODO_REMINDER_DEFAULT_TIME = '09:00'  # due time assumed for todos without one
+TODO_REMINDER_BATCH_SIZE = 100
+TODO_REMINDER_POLL_INTERVAL = 30  # seconds
+
+# Most queries each view (by URL name, or "METHOD name" for one method) may run;
+# RequestMetricsMiddleware logs a warning when one goes over, or raises if
+# TODO_QUERY_BUDGET_STRICT is on.
+# Budgets cover the worst case, a user whose TodoCounters row is missing
+# (QueryBudgetTests in myapp/tests.py runs each view that way)
+TODO_QUERY_BUDGETS = {
+    'home': 11,
+    'task_page': 4,
+    'add_todo': 8,
+    'edit_todo': 15,
+    'toggle_todo': 13,
+    'delete_todo': 15,
+    'api_todo_list': 11,
+    'api_todo_detail': 12,
+    'api_todo_toggle': 10,
+    'api_todo_batch': 20,
+    'api_todo_export': 2,
+    'api_todo_suggest': 4,  # the first search in a process also checks the index exists
+    'api_todo_changes': 6,
+    # Filtering by user adds Django's own date hierarchy query and the selected user's
+    # lookup for the autocomplete box
+    'admin:myapp_todo_changelist': 8,
+    # Bulk actions, measured deleting one todo: Django's delete_selected logs an
+    # admin LogEntry per todo, so each extra todo deleted adds one query
+    'POST admin:myapp_todo_changelist': 17,
+}
+TODO_QUERY_BUDGET_STRICT = config('TODO_QUERY_BUDGET_STRICT', default=False, cast=bool)
+
+# cProfile capture for staff requests made with ?profile=1 or an "X-Profile: 1"
+# header. Off by default, in which case ProfilingMiddleware removes itself.
+# Profiles are listed in the admin under Todos > Request profiles.
+TODO_PROFILING = config('TODO_PROFILING', default=False, cast=bool)
+TODO_PROFILE_SAMPLE_RATE = config('TODO_PROFILE_SAMPLE_RATE', default=1.0, cast=float)  # share of opted-in requests profiled
+TODO_PROFILE_DIR = config('TODO_PROFILE_DIR', default=str(BASE_DIR / 'profiles'))
+TODO_PROFILE_MAX_FILES = 200  # oldest profiles are deleted beyond this
+
+# Number of tasks rendered per page of the task lists
+TODO_PAGE_SIZE = 50
+
+# Rows fetched per database round trip by the streaming CSV/NDJSON/iCalendar exports
+TODO_EXPORT_CHUNK_SIZE = 2000
+
+# Valid rows inserted per transaction by the CSV/NDJSON import
+TODO_IMPORT_BATCH_SIZE = 1000
+
+# Full-text search: 'auto' uses SQLite FTS5 or PostgreSQL tsvector, 'like' forces icontains
+TODO_SEARCH_BACKEND = config('TODO_SEARCH_BACKEND', default='auto')
+
+# Per-process LRU cache for search suggestions
+TODO_SUGGESTION_CACHE_SIZE = 1000
+TODO_SUGGESTION_TTL = 60  # seconds
+
+# Cache for rendered task fragments and sidebar counts. It must be shared by
+# every worker, or a version bump made by one worker leaves the others serving
+# stale pages. Set REDIS_URL (needs the redis package) when running on more
+# than one machine; otherwise the workers of one machine share files in
+# CACHE_DIR. Only DEBUG runs fall back to local memory, which is per process.
+if config('REDIS_URL', default=''):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': config('REDIS_URL'),
+        }
+    }
+elif config('CACHE_DIR', default='') or not DEBUG:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': config('CACHE_DIR', default=str(BASE_DIR / 'cache')),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'todo-fragments',
+        }
+    }
+
+TODO_FRAGMENT_CACHE_TIMEOUT = 300  # seconds
+
+# The TodoAdmin statistics cover every todo, so they are cached briefly rather
+# than recomputed on each changelist load; the admin bulk actions clear them
+TODO_ADMIN_STATS_TIMEOUT = 60  # seconds
+
+# Above this many rows the unfiltered TodoAdmin changelist shows PostgreSQL's
+# row estimate instead of running an exact COUNT(*)
+TODO_ADMIN_ESTIMATED_COUNT_THRESHOLD = 100_000
+
+# One structured line per request from RequestMetricsMiddleware on stdout
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'myapp.metrics': {
+            'handlers': ['console'],
+            'level': config('TODO_METRICS_LOG_LEVEL', default='INFO'),
+            'propagate': False,
+        },
+    },
+}
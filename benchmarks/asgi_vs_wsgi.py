@@ -0,0 +1,134 @@
+"""Compare requests/sec of the WSGI (sync views) and ASGI (async views) servers.
+
+Starts gunicorn with N sync workers against ToDo.wsgi, then gunicorn with N
+uvicorn workers against ToDo.asgi with TODO_ASYNC_VIEWS=True, logs in as an
+existing user and replays the same GET requests against both with a pool of
+concurrent clients.
+
+    python benchmarks/asgi_vs_wsgi.py --username alice --password secret \
+        --workers 2 --concurrency 32 --requests 2000
+
+Run it from the project root with the same DATABASE_URL as the app; the
+results are printed as JSON.
+"""
+import argparse
+import http.client
+import json
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode
+
+MODES = {
+    'wsgi': (['ToDo.wsgi'], {'TODO_ASYNC_VIEWS': 'False'}),
+    'asgi': (['ToDo.asgi:application', '-k', 'uvicorn.workers.UvicornWorker'], {'TODO_ASYNC_VIEWS': 'True'}),
+}
+DEFAULT_PATHS = ['/', '/?view=upcoming', '/tasks/?limit=20', '/tasks/?section=overdue']
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'server on port {port} did not start')
+
+
+def login(port, username, password):
+    """Return the Cookie header of a logged-in session"""
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    conn.request('GET', '/login/')
+    response = conn.getresponse()
+    page = response.read().decode()
+    cookies = SimpleCookie(response.getheader('Set-Cookie'))
+    token = re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"', page).group(1)
+    body = urlencode({'csrfmiddlewaretoken': token, 'username': username, 'password': password})
+    conn.request('POST', '/login/', body, {
+        'Content-Type': 'application/x-www-form-urlencoded',
+        'Cookie': f"csrftoken={cookies['csrftoken'].value}",
+    })
+    response = conn.getresponse()
+    response.read()
+    cookies.load(response.getheader('Set-Cookie') or '')
+    if 'sessionid' not in cookies:
+        raise RuntimeError('login failed; check --username and --password')
+    return '; '.join(f'{name}={morsel.value}' for name, morsel in cookies.items())
+
+
+def run_client(port, cookie, paths, count):
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    latencies = []
+    for i in range(count):
+        start = time.perf_counter()
+        conn.request('GET', paths[i % len(paths)], headers={'Cookie': cookie})
+        response = conn.getresponse()
+        response.read()
+        if response.status != 200:
+            raise RuntimeError(f'{paths[i % len(paths)]} returned {response.status}')
+        latencies.append(time.perf_counter() - start)
+    conn.close()
+    return latencies
+
+
+def benchmark(mode, args):
+    target, env = MODES[mode]
+    port = args.port
+    server = subprocess.Popen(
+        ['gunicorn', *target, '-w', str(args.workers), '-b', f'127.0.0.1:{port}', '--log-level', 'warning'],
+        env={**os.environ, **env},
+    )
+    try:
+        wait_for_port(port)
+        cookie = login(port, args.username, args.password)
+        per_client = max(args.requests // args.concurrency, 1)
+        # Warm up caches and connections before timing
+        run_client(port, cookie, args.paths, len(args.paths) * args.workers)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            results = pool.map(lambda _: run_client(port, cookie, args.paths, per_client), range(args.concurrency))
+            latencies = sorted(latency for result in results for latency in result)
+        elapsed = time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait()
+    return {
+        'requests': len(latencies),
+        'requests_per_sec': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(statistics.median(latencies) * 1000, 2),
+        'p95_ms': round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--username', required=True)
+    parser.add_argument('--password', required=True)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--path', dest='paths', action='append', help='URL to request (repeatable)')
+    args = parser.parse_args()
+    args.paths = args.paths or DEFAULT_PATHS
+
+    report = {
+        'workers': args.workers,
+        'concurrency': args.concurrency,
+        'paths': args.paths,
+        'results': {mode: benchmark(mode, args) for mode in MODES},
+    }
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == '__main__':
+    main()
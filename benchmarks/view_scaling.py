@@ -0,0 +1,167 @@
+"""Measure how the main views scale with the number of todos.
+
+Creates a throwaway test database, then for each data size seeds todos with
+the seed_todos command (sizes are todos per user and are cumulative) and
+requests every scenario below through the Django test client as a superuser
+who owns the seeded todos. For each scenario it records p50/p95 latency,
+queries per request and the peak memory allocated by one request, twice:
+"cold" clears the cache before every request, so cached fragments, sidebar
+counts and admin stats are rebuilt each time, and "warm" times repeat
+requests that are served from those caches.
+
+    python benchmarks/view_scaling.py --sizes 100 1000 10000 --requests 30 \
+        --output results.json --compare previous.json
+
+Run it from the project root. The test database follows DATABASES, so with
+DATABASE_URL set to PostgreSQL it runs against a fresh PostgreSQL database;
+the default SQLite settings give an in-memory database. Results are printed
+and saved as JSON; --compare prints the p50 change against an earlier run.
+"""
+import argparse
+import gc
+import io
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ToDo.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.core.cache import cache  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.test.utils import CaptureQueriesContext, setup_test_environment  # noqa: E402
+
+SCENARIOS = {
+    'home': '/',
+    'home_upcoming': '/?view=upcoming',
+    'home_search': '/?search=report',
+    'home_priority_sort': '/?sort=priority',
+    'task_page': '/tasks/?limit=20',
+    'api_todo_list': '/api/v1/todos/',
+    'api_todo_search': '/api/v1/todos/?search=report',
+    'admin_changelist': '/admin/myapp/todo/',
+    'admin_search': '/admin/myapp/todo/?q=report',
+}
+USERS = 5
+
+
+def measure(client, path, requests, cold):
+    if not cold:
+        # One untimed request warms the caches the way a returning user would
+        client.get(path)
+    latencies = []
+    queries = []
+    for _ in range(requests):
+        if cold:
+            # Sessions live in the database, so this only drops cached fragments, counts and stats
+            cache.clear()
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = client.get(path)
+            latencies.append(time.perf_counter() - start)
+        if response.status_code != 200:
+            raise RuntimeError(f'{path} returned {response.status_code}')
+        queries.append(len(captured))
+
+    # Memory is measured on a separate request since tracemalloc slows everything down
+    gc.collect()
+    if cold:
+        cache.clear()
+    tracemalloc.start()
+    client.get(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        'p50_ms': round(statistics.median(latencies) * 1000, 2),
+        'p95_ms': round(latencies[max(int(len(latencies) * 0.95) - 1, 0)] * 1000, 2),
+        'queries': max(queries),
+        'peak_memory_kb': round(peak / 1024, 1),
+    }
+
+
+def run(args):
+    client = Client()
+    results = []
+    seeded = 0
+    for size in sorted(args.sizes):
+        call_command('seed_todos', users=USERS, todos=size - seeded, prefix='bench', seed=size, stdout=io.StringIO())
+        seeded = size
+        user = User.objects.get(username='bench0001')
+        if not user.is_superuser:
+            user.is_staff = user.is_superuser = True
+            user.save(update_fields=['is_staff', 'is_superuser'])
+        client.force_login(user)
+        print(f'{size} todos per user:', file=sys.stderr)
+        scenarios = {}
+        for name, path in SCENARIOS.items():
+            scenarios[name] = {
+                'cold': measure(client, path, args.requests, cold=True),
+                'warm': measure(client, path, args.requests, cold=False),
+            }
+            for mode, result in scenarios[name].items():
+                print(f'  {name} ({mode}): {result}', file=sys.stderr)
+        results.append({'todos_per_user': size, 'total_todos': size * USERS, 'scenarios': scenarios})
+    return results
+
+
+def compare(report, previous):
+    earlier = {run['todos_per_user']: run['scenarios'] for run in previous['results']}
+    for run in report['results']:
+        for name, modes in run['scenarios'].items():
+            for mode, result in modes.items():
+                before = earlier.get(run['todos_per_user'], {}).get(name, {}).get(mode)
+                if before:
+                    change = (result['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100
+                    print(
+                        f"{run['todos_per_user']:>7} {name:<20} {mode:<4} p50 {before['p50_ms']:>8} -> "
+                        f"{result['p50_ms']:>8} ms ({change:+.0f}%), queries {before['queries']} -> {result['queries']}",
+                        file=sys.stderr,
+                    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 5000], help='Todos per user')
+    parser.add_argument('--requests', type=int, default=20, help='Timed requests per scenario')
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    parser.add_argument('--compare', help='Earlier JSON report to compare against')
+    args = parser.parse_args()
+
+    # Keep the per-request metrics lines out of the report; budget warnings still show
+    logging.getLogger('myapp.metrics').setLevel(logging.WARNING)
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        report = {
+            'database': connection.vendor,
+            'users': USERS,
+            'requests': args.requests,
+            'results': run(args),
+        }
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2) + '\n')
+    if args.compare:
+        compare(report, json.loads(Path(args.compare).read_text()))
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == '__main__':
+    main()
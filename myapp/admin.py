@@ -1,7 +1,22 @@
+from datetime import datetime, timezone as dt_timezone
+
+from django import forms
+from django.conf import settings
 from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.contrib.auth.models import User
+from django.core.exceptions import PermissionDenied
+from django.http import FileResponse, Http404, StreamingHttpResponse
+from django.template.response import TemplateResponse
+from django.urls import path
 from django.utils.html import format_html
 from django.utils import timezone
+from .caching import clear_admin_stats, get_cached_admin_stats
+from .exports import EXPORT_FIELDS, export_todos
 from .models import Todo
+from .pagination import EstimatedCountPaginator
+from .profiling import get_profile_store
 
 # Customize admin site headers
 admin.site.site_header = "📋 Todo App Administration"
@@ -10,6 +25,50 @@ admin.site.index_title = "Welcome to Todo App Admin"
 
 # Register your models here.
 
+class UserAutocompleteFilter(admin.SimpleListFilter):
+    """Filter todos by user through the admin's user autocomplete.
+
+    The stock related-field filter lists every user in the sidebar; this
+    one renders a search box that loads matching users on demand from the
+    user admin's search_fields.
+    """
+    title = 'user'
+    # Same parameter as the stock filter, so existing links keep working
+    parameter_name = 'user__id__exact'
+    template = 'admin/myapp/autocomplete_filter.html'
+    
+    def __init__(self, request, params, model, model_admin):
+        self.admin_site = model_admin.admin_site
+        super().__init__(request, params, model, model_admin)
+    
+    def lookups(self, request, model_admin):
+        return ()
+    
+    def has_output(self):
+        return True
+    
+    def queryset(self, request, queryset):
+        if self.value():
+            try:
+                return queryset.filter(user_id=self.value())
+            except ValueError as e:
+                raise IncorrectLookupParameters(e)
+        return queryset
+    
+    def choices(self, changelist):
+        field = forms.ModelChoiceField(
+            User.objects.all(),
+            widget=AutocompleteSelect(Todo._meta.get_field('user'), self.admin_site),
+            required=False,
+        )
+        yield {
+            'selected': self.value() is not None,
+            'widget': field.widget.render(self.parameter_name, self.value()),
+            'params': [(name, value) for name, value in changelist.params.items() if name != self.parameter_name],
+            'clear_query_string': changelist.get_query_string(remove=[self.parameter_name]),
+        }
+
+
 @admin.register(Todo)
 class TodoAdmin(admin.ModelAdmin):
     list_display = (
@@ -26,11 +85,18 @@ class TodoAdmin(admin.ModelAdmin):
         'priority', 
         'due_date', 
         'created_at',
-        'user'
+        UserAutocompleteFilter,
     )
     search_fields = ('text', 'user__username', 'user__first_name', 'user__last_name')
+    # user is shown on every row, and a user select would list every account
+    list_select_related = ('user',)
+    autocomplete_fields = ('user',)
+    paginator = EstimatedCountPaginator
+    # Skip the second, unfiltered COUNT(*) on filtered pages
+    show_full_result_count = False
     ordering = ('-created_at',)
     date_hierarchy = 'due_date'
+    change_list_template = 'admin/myapp/todo_change_list.html'
     
     # Organize fields in the detail view
     fieldsets = (
@@ -42,16 +108,19 @@ class TodoAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
         ('Timestamps', {
-            'fields': ('created_at', 'updated_at'),
+            'fields': ('created_at', 'updated_at', 'next_reminder_at', 'reminder_sent_at'),
             'classes': ('collapse',),
         }),
     )
     
     # Make timestamps read-only
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('created_at', 'updated_at', 'next_reminder_at', 'reminder_sent_at')
     
     # Enable actions
-    actions = ['mark_completed', 'mark_incomplete', 'set_high_priority', 'set_medium_priority', 'set_low_priority']
+    actions = [
+        'mark_completed', 'mark_incomplete', 'set_high_priority', 'set_medium_priority', 'set_low_priority',
+        'export_csv', 'export_ndjson', 'export_ics',
+    ]
     
     def priority_badge(self, obj):
         """Display priority as colored badge"""
@@ -60,7 +129,7 @@ class TodoAdmin(admin.ModelAdmin):
             'medium': '#ffc107', 
             'low': '#28a745'
         }
-        color = colors.get(obj.priority, '#6c757d')
+        color = colors.get(obj.priority_key, '#6c757d')
         return format_html(
             '<span style="background: {}; color: white; padding: 2px 8px; border-radius: 12px; font-size: 11px; font-weight: bold;">{}</span>',
             color,
@@ -88,55 +157,102 @@ class TodoAdmin(admin.ModelAdmin):
     mark_incomplete.short_description = '⏳ Mark selected todos as incomplete'
     
     def set_high_priority(self, request, queryset):
-        updated = queryset.update(priority='high', updated_at=timezone.now())
+        updated = queryset.update(priority=Todo.HIGH, updated_at=timezone.now())
         self.message_user(request, f'{updated} todo(s) set to high priority.')
     set_high_priority.short_description = '🔴 Set priority to High'
     
     def set_medium_priority(self, request, queryset):
-        updated = queryset.update(priority='medium', updated_at=timezone.now())
+        updated = queryset.update(priority=Todo.MEDIUM, updated_at=timezone.now())
         self.message_user(request, f'{updated} todo(s) set to medium priority.')
     set_medium_priority.short_description = '🟡 Set priority to Medium'
     
     def set_low_priority(self, request, queryset):
-        updated = queryset.update(priority='low', updated_at=timezone.now())
+        updated = queryset.update(priority=Todo.LOW, updated_at=timezone.now())
         self.message_user(request, f'{updated} todo(s) set to low priority.')
     set_low_priority.short_description = '🟢 Set priority to Low'
     
+    # Exports stream the rows, so "Select all" works on tables of any size
+    def export(self, request, queryset, export_format):
+        filename = f'todos-{timezone.now().date().isoformat()}'
+        fields = ['id', 'user__username', *EXPORT_FIELDS[1:]]
+        return export_todos(queryset, export_format, filename, request, fields)
+    
+    def export_csv(self, request, queryset):
+        return self.export(request, queryset, 'csv')
+    export_csv.short_description = '📄 Export selected todos as CSV'
+    
+    def export_ndjson(self, request, queryset):
+        return self.export(request, queryset, 'ndjson')
+    export_ndjson.short_description = '📄 Export selected todos as NDJSON'
+    
+    def export_ics(self, request, queryset):
+        return self.export(request, queryset, 'ics')
+    export_ics.short_description = '📅 Export selected todos as iCalendar'
+    
+    @property
+    def media(self):
+        # The user filter's autocomplete widget needs the select2 assets on the changelist too
+        return super().media + AutocompleteSelect(Todo._meta.get_field('user'), self.admin_site).media
+    
+    def response_action(self, request, queryset):
+        response = super().response_action(request, queryset)
+        if isinstance(response, StreamingHttpResponse):
+            # An export, which changed nothing
+            return response
+        # Show the action's effect in the statistics instead of waiting for the cache to expire
+        clear_admin_stats(timezone.now().date())
+        return response
+    
     # Custom view for statistics in changelist
     def changelist_view(self, request, extra_context=None):
         # Add statistics to the context
         extra_context = extra_context or {}
         
-        # Get statistics
-        total_todos = Todo.objects.count()
-        completed_todos = Todo.objects.filter(completed=True).count()
-        pending_todos = total_todos - completed_todos
-        
-        # Priority stats
-        high_priority = Todo.objects.filter(priority='high').count()
-        medium_priority = Todo.objects.filter(priority='medium').count() 
-        low_priority = Todo.objects.filter(priority='low').count()
-        
-        # Overdue todos (past due date and not completed)
         today = timezone.now().date()
-        overdue_todos = Todo.objects.filter(
-            due_date__lt=today, 
-            completed=False
-        ).count()
-        
-        # Today's todos
-        today_todos = Todo.objects.filter(due_date=today).count()
+        stats = get_cached_admin_stats(today, lambda: Todo.objects.admin_stats(today))
+        total_todos = stats['total_todos']
+        completed_todos = stats['completed_todos']
         
         extra_context.update({
-            'total_todos': total_todos,
-            'completed_todos': completed_todos,
-            'pending_todos': pending_todos,
+            **stats,
+            'pending_todos': total_todos - completed_todos,
             'completion_rate': round((completed_todos / total_todos * 100) if total_todos > 0 else 0, 1),
-            'high_priority': high_priority,
-            'medium_priority': medium_priority,
-            'low_priority': low_priority,
-            'overdue_todos': overdue_todos,
-            'today_todos': today_todos,
         })
         
         return super().changelist_view(request, extra_context)
+
+    def get_urls(self):
+        urls = [
+            path('profiles/', self.admin_site.admin_view(self.profiles_view), name='myapp_todo_profiles'),
+            path(
+                'profiles/<str:name>/download/',
+                self.admin_site.admin_view(self.profile_download_view),
+                name='myapp_todo_profile_download',
+            ),
+        ]
+        return urls + super().get_urls()
+
+    def profiles_view(self, request):
+        """Slowest captured request profiles, grouped by URL name"""
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        groups = get_profile_store().slowest_by_view()
+        for _, profiles in groups:
+            for profile in profiles:
+                profile['captured'] = datetime.fromtimestamp(profile['captured_at'], tz=dt_timezone.utc)
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Request profiles',
+            'opts': self.model._meta,
+            'groups': groups,
+            'profiling_enabled': settings.TODO_PROFILING,
+        }
+        return TemplateResponse(request, 'admin/myapp/profiles.html', context)
+
+    def profile_download_view(self, request, name):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        stats_path = get_profile_store().stats_path(name)
+        if stats_path is None:
+            raise Http404('No such profile.')
+        return FileResponse(stats_path.open('rb'), as_attachment=True, filename=f'{name}.prof')
@@ -0,0 +1,339 @@
+"""Versioned JSON API for todos.
+
+All endpoints use the session of the logged-in user and only ever see that
+user's todos. List responses are keyset paginated, accept a ``fields=``
+projection and answer ``If-None-Match`` with ``304 Not Modified`` when the
+user's todos have not changed.
+"""
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import transaction
+from django.http import HttpResponse, JsonResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.views.decorators.http import condition, require_http_methods
+from .exports import EXPORT_FORMATS, export_todos
+from .forms import TodoForm
+from .imports import ImportFormatError, detect_format, import_todos, read_rows
+from .models import Todo, TodoChange
+from .pagination import InvalidCursor, keyset_page
+from .search import search_todos
+from .suggestions import MAX_SUGGESTIONS, get_suggestions
+from .views import get_sidebar_counts, get_task_list_params
+
+# Fields a client may request with ?fields=
+API_FIELDS = ['id', 'text', 'completed', 'due_date', 'due_time', 'priority', 'category', 'created_at', 'updated_at']
+
+# Operations accepted by the batch endpoint
+BATCH_OPERATIONS = ['complete', 'uncomplete', 'delete', 'set_priority', 'set_category', 'shift_due_date']
+
+# Largest number of ids accepted in one batch request
+MAX_BATCH_SIZE = 1000
+
+# Most change log entries read by one delta sync request
+MAX_CHANGES = 1000
+
+# Fields accepted when creating or updating a todo
+FORM_FIELDS = ['text', 'due_date', 'due_time', 'priority', 'category']
+
+
+def api_login_required(view_func):
+    """Like login_required, but answers 401 JSON instead of redirecting"""
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'Authentication required.'}, status=401)
+        return view_func(request, *args, **kwargs)
+    return wrapper
+
+
+def serialize_todo(todo, fields=API_FIELDS):
+    data = {}
+    for name in fields:
+        value = getattr(todo, name)
+        data[name] = value.isoformat() if hasattr(value, 'isoformat') else value
+    return data
+
+
+def parse_fields(request):
+    """Return the requested ?fields= projection, or None if it is invalid"""
+    requested = request.GET.get('fields')
+    if not requested:
+        return API_FIELDS
+    fields = [name.strip() for name in requested.split(',') if name.strip()]
+    if not fields or any(name not in API_FIELDS for name in fields):
+        return None
+    return fields
+
+
+def parse_body(request):
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def completed_error(data):
+    """400 response when the body has a ``completed`` that is not a JSON boolean, else None"""
+    if 'completed' in data and not isinstance(data['completed'], bool):
+        return JsonResponse({'errors': {'completed': ['Must be true or false.']}}, status=400)
+    return None
+
+
+def get_user_todo(request, todo_id):
+    return Todo.objects.filter(id=todo_id, user=request.user).first()
+
+
+def not_found():
+    return JsonResponse({'error': 'Todo not found.'}, status=404)
+
+
+def validate_batch(data):
+    """Return an error message for an invalid batch request body, or None"""
+    ids = data.get('ids')
+    if not isinstance(ids, list) or not ids or not all(isinstance(pk, int) for pk in ids):
+        return 'ids must be a non-empty list of integers.'
+    if len(ids) > MAX_BATCH_SIZE:
+        return f'At most {MAX_BATCH_SIZE} ids can be changed at once.'
+    operation, value = data.get('operation'), data.get('value')
+    if operation not in BATCH_OPERATIONS:
+        return f"operation must be one of: {', '.join(BATCH_OPERATIONS)}."
+    # bool is an int, and True == 1 would pass the membership test
+    if operation == 'set_priority' and (
+        not isinstance(value, int) or isinstance(value, bool) or value not in dict(Todo.PRIORITY_CHOICES)
+    ):
+        return 'value must be a valid priority.'
+    if operation == 'set_category' and value not in dict(Todo.CATEGORY_CHOICES):
+        return 'value must be a valid category.'
+    if operation == 'shift_due_date' and (not isinstance(value, int) or isinstance(value, bool) or abs(value) > 3650):
+        return 'value must be a number of days between -3650 and 3650.'
+    return None
+
+
+def todo_list_etag(request):
+    """ETag for a list request: the user's data version, the query and the day"""
+    if request.method != 'GET':
+        return None
+    version = Todo.objects.filter(user=request.user).data_version()
+    key = f"{version}|{request.GET.urlencode()}|{timezone.now().date().isoformat()}"
+    return '"%s"' % hashlib.md5(key.encode()).hexdigest()
+
+
+@api_login_required
+@require_http_methods(['GET', 'POST'])
+@condition(etag_func=todo_list_etag)
+def todo_list(request):
+    if request.method == 'POST':
+        data = parse_body(request)
+        if data is None:
+            return JsonResponse({'error': 'Request body must be a JSON object.'}, status=400)
+        error = completed_error(data)
+        if error:
+            return error
+        form = TodoForm({name: data.get(name) for name in FORM_FIELDS if name in data})
+        if not form.is_valid():
+            return JsonResponse({'errors': form.errors}, status=400)
+        todo = form.save(commit=False)
+        todo.user = request.user
+        todo.completed = data.get('completed', False)
+        todo.save()
+        return JsonResponse(serialize_todo(todo), status=201)
+    
+    fields = parse_fields(request)
+    if fields is None:
+        return JsonResponse({'error': f"Unknown field. Choose from: {', '.join(API_FIELDS)}."}, status=400)
+    params = get_task_list_params(request)
+    ordering = Todo.SORT_ORDERINGS[params['sort']]
+    
+    todos = Todo.objects.filter(user=request.user)
+    if params['search_query']:
+        todos = search_todos(todos, params['search_query'])
+    if params['view'] or params['category']:
+        todos = todos.for_view(params['view'], params['category'])
+    # Always load the ordering fields, which the next cursor is built from
+    todos = todos.only(*set(fields) | {name.lstrip('-') for name in ordering})
+    try:
+        page, next_cursor = keyset_page(todos, ordering, params['cursor'], params['page_size'])
+    except InvalidCursor:
+        return JsonResponse({'error': 'Invalid cursor.'}, status=400)
+    
+    next_url = None
+    if next_cursor:
+        query = request.GET.copy()
+        query['cursor'] = next_cursor
+        next_url = f"{reverse('api_todo_list')}?{query.urlencode()}"
+    return JsonResponse({
+        'results': [serialize_todo(todo, fields) for todo in page],
+        'next_cursor': next_cursor,
+        'next': next_url,
+    })
+
+
+@api_login_required
+@require_http_methods(['GET', 'PATCH', 'PUT', 'DELETE'])
+def todo_detail(request, todo_id):
+    todo = get_user_todo(request, todo_id)
+    if todo is None:
+        return not_found()
+    
+    if request.method == 'DELETE':
+        todo.delete()
+        return HttpResponse(status=204)
+    
+    if request.method in ('PATCH', 'PUT'):
+        data = parse_body(request)
+        if data is None:
+            return JsonResponse({'error': 'Request body must be a JSON object.'}, status=400)
+        error = completed_error(data)
+        if error:
+            return error
+        if request.method == 'PATCH':
+            # Fill in the fields the client did not send from the stored todo
+            current = serialize_todo(todo, FORM_FIELDS)
+            data = {**current, **data}
+        form = TodoForm({name: data.get(name) for name in FORM_FIELDS if name in data}, instance=todo)
+        if not form.is_valid():
+            return JsonResponse({'errors': form.errors}, status=400)
+        todo = form.save(commit=False)
+        if 'completed' in data:
+            todo.completed = data['completed']
+        todo.save()
+    
+    return JsonResponse(serialize_todo(todo))
+
+
+@api_login_required
+@require_http_methods(['POST'])
+def todo_toggle(request, todo_id):
+    if not Todo.objects.toggle_completed(todo_id, request.user):
+        return not_found()
+    return JsonResponse(serialize_todo(get_user_todo(request, todo_id)))
+
+
+@api_login_required
+@require_http_methods(['POST'])
+def todo_batch(request):
+    data = parse_body(request)
+    if data is None:
+        return JsonResponse({'error': 'Request body must be a JSON object.'}, status=400)
+    error = validate_batch(data)
+    if error:
+        return JsonResponse({'error': error}, status=400)
+    
+    # Ids belonging to other users are silently out of scope
+    with transaction.atomic():
+        todos = Todo.objects.filter(user=request.user, id__in=data['ids'])
+        affected = todos.apply_batch(data['operation'], data.get('value'))
+    return JsonResponse({
+        'operation': data['operation'],
+        'affected': affected,
+        'counts': get_sidebar_counts(request.user),
+    })
+
+
+@api_login_required
+@require_http_methods(['GET'])
+def todo_export(request):
+    """All of the user's todos as a streamed ``?format=csv`` (default), ``ndjson`` or ``ics`` download"""
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return JsonResponse({'error': f"Unknown format. Choose from: {', '.join(EXPORT_FORMATS)}."}, status=400)
+    filename = f'todos-{timezone.now().date().isoformat()}'
+    return export_todos(Todo.objects.filter(user=request.user), export_format, filename, request)
+
+
+@api_login_required
+@require_http_methods(['POST'])
+def todo_import(request):
+    """Create todos from an uploaded CSV or NDJSON ``file``; answers with the per-row report"""
+    upload = request.FILES.get('file')
+    if upload is None:
+        return JsonResponse({'error': 'Upload the todos as a multipart "file" field.'}, status=400)
+    try:
+        import_format = detect_format(upload.name, request.GET.get('format') or request.POST.get('format'))
+    except ImportFormatError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    # Large uploads are spooled to a temporary file, which is read line by line
+    report = import_todos(request.user, read_rows(upload, import_format), settings.TODO_IMPORT_BATCH_SIZE)
+    return JsonResponse(report, status=201 if report['created'] else 200)
+
+
+@api_login_required
+@require_http_methods(['GET'])
+def todo_suggest(request):
+    try:
+        limit = min(max(int(request.GET.get('limit', '')), 1), MAX_SUGGESTIONS)
+    except ValueError:
+        limit = MAX_SUGGESTIONS
+    suggestions = get_suggestions(request.user, request.GET.get('q', ''))[:limit]
+    return JsonResponse({'suggestions': [{'id': pk, 'text': text} for pk, text in suggestions]})
+
+
+def reset_changes(oldest, settled_before):
+    """Tell the client to refetch everything, then sync from a cursor before any unsettled entry"""
+    cursor = TodoChange.objects.filter(changed_at__lt=settled_before).order_by('-id').values_list('id', flat=True).first()
+    cursor = max(cursor or 0, oldest - 1)
+    return JsonResponse({'reset': True, 'cursor': str(cursor), 'changed': [], 'deleted': [], 'has_more': False})
+
+
+@api_login_required
+@require_http_methods(['GET'])
+def todo_changes(request):
+    """Todos created, updated or deleted since ``?since=<cursor>``.
+
+    Without a cursor, with one older than the retained change log, or after
+    a bulk update too large to log per todo, the response has ``reset: true``:
+    the client should refetch everything from todo_list() and then sync from
+    the returned cursor. The cursor trails changes made in the last
+    ``TODO_CHANGE_LOG_SETTLE_SECONDS``, so those are sent again next time.
+    """
+    fields = parse_fields(request)
+    if fields is None:
+        return JsonResponse({'error': f"Unknown field. Choose from: {', '.join(API_FIELDS)}."}, status=400)
+    # Clients match changed rows by id, so it is always included
+    fields = ['id', *(name for name in fields if name != 'id')]
+    try:
+        since = int(request.GET['since'])
+    except KeyError:
+        since = None
+    except ValueError:
+        return JsonResponse({'error': 'Invalid cursor.'}, status=400)
+    
+    latest = TodoChange.objects.order_by('-id').values_list('id', flat=True).first() or 0
+    oldest = TodoChange.objects.order_by('id').values_list('id', flat=True).first() or 1
+    # Entries this recent may have neighbours with lower ids that have not
+    # committed yet, so they are sent but the cursor stops short of them
+    settled_before = timezone.now() - timedelta(seconds=settings.TODO_CHANGE_LOG_SETTLE_SECONDS)
+    if since is None or since < oldest - 1 or since > latest:
+        return reset_changes(oldest, settled_before)
+    
+    entries = list(
+        TodoChange.objects.filter(user=request.user, id__gt=since).order_by('id')
+        .values_list('id', 'todo_id', 'deleted', 'reset', 'changed_at')[:MAX_CHANGES]
+    )
+    if any(reset for _, _, _, reset, _ in entries):
+        return reset_changes(oldest, settled_before)
+    cursor = since
+    for pk, _, _, _, changed_at in entries:
+        if changed_at >= settled_before:
+            break
+        cursor = pk
+    # Only the last entry for each todo matters
+    deleted_by_id = {todo_id: deleted for _, todo_id, deleted, _, _ in entries}
+    changed = Todo.objects.filter(
+        user=request.user, pk__in=[pk for pk, deleted in deleted_by_id.items() if not deleted]
+    ).only(*fields)
+    changed = [serialize_todo(todo, fields) for todo in changed]
+    found = {todo['id'] for todo in changed}
+    return JsonResponse({
+        'reset': False,
+        'cursor': str(cursor),
+        'changed': changed,
+        'deleted': [pk for pk, deleted in deleted_by_id.items() if deleted or pk not in found],
+        'has_more': len(entries) == MAX_CHANGES and cursor == entries[-1][0],
+    })
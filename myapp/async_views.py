@@ -0,0 +1,194 @@
+"""Async versions of the task views, used when TODO_ASYNC_VIEWS is on.
+
+They are routed in place of the sync views in urls.py and are meant to run
+under an ASGI server (see "ASGI deployment" in the README), as is the
+live-update event stream, which has no sync version. The helpers in
+views.py are shared; anything that touches the session, signal receivers or
+template rendering runs on the request's sync thread via sync_to_async.
+"""
+import asyncio
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.views import redirect_to_login
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.http import Http404, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.shortcuts import redirect, render
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+from .caching import LazyTaskPage, get_todo_version
+from .events import event_stream, live_updates_available
+from .forms import TodoForm
+from .models import Todo, TodoCounters
+from .pagination import InvalidCursor, akeyset_page, decode_cursor
+from .views import (
+    get_home_context, get_home_counts, get_list_cache_key, get_task_list_params, get_task_list_queryset,
+    get_task_page, home_etag, is_ajax,
+)
+
+
+def _resolve_user(request):
+    # request.user is a lazy object backed by the session
+    user = request.user
+    user.is_authenticated
+    return user
+
+
+async def aget_user(request):
+    return await sync_to_async(_resolve_user)(request)
+
+
+def async_login_required(view_func):
+    """login_required for async views"""
+    @wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        user = await aget_user(request)
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view_func(request, *args, **kwargs)
+    return wrapper
+
+
+async def aget_sidebar_counts(user, today=None):
+    if settings.TODO_COUNTER_TABLE:
+        return await TodoCounters.afor_user(user, today)
+    return await Todo.objects.filter(user=user).asidebar_counts(today)
+
+
+async def aget_task_page(user, params, today, view, category, cursor=None):
+    queryset = get_task_list_queryset(user, params, today, view, category)
+    return await akeyset_page(queryset, Todo.SORT_ORDERINGS[params['sort']], cursor, params['page_size'])
+
+
+@async_login_required
+async def home(request):
+    etag = await sync_to_async(home_etag)(request)
+    if etag:
+        response = get_conditional_response(request, etag=etag)
+        if response is not None:
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+
+    form = TodoForm()
+    params = get_task_list_params(request)
+    category = params['category']
+    view = params['view']
+
+    if request.method == 'POST':
+        form = TodoForm(request.POST)
+        if form.is_valid():
+            todo = form.save(commit=False)
+            todo.user = request.user
+            await todo.asave()
+            messages.success(request, f'Task "{todo.text}" created successfully!')
+            return redirect('home')
+
+    if params['cursor']:
+        try:
+            decode_cursor(Todo, Todo.SORT_ORDERINGS[params['sort']], params['cursor'])
+        except InvalidCursor:
+            return HttpResponseBadRequest('Invalid cursor.')
+
+    today = timezone.now().date()
+    current_page = LazyTaskPage(
+        lambda: get_task_page(request.user, params, today, view, category, params['cursor'])
+    )
+    overdue_page = None
+    if not category and not view:
+        overdue_page = LazyTaskPage(lambda: get_task_page(request.user, params, today, 'missed', ''))
+
+    version = await sync_to_async(get_todo_version)(request.user.pk)
+    list_cache_key = get_list_cache_key(request, version, today)
+
+    # When the task sections are not cached, load their pages alongside the sidebar counts
+    pending = [sync_to_async(get_home_counts)(request.user, params['search_query'], today, version)]
+    sections_key = make_template_fragment_key('todo_sections', [request.user.id, list_cache_key])
+    if not await cache.ahas_key(sections_key):
+        pending += [page.aload() for page in (current_page, overdue_page) if page is not None]
+    sidebar_counts, *_ = await asyncio.gather(*pending)
+
+    context = get_home_context(request, params, form, today, version, sidebar_counts, current_page, overdue_page)
+    response = await sync_to_async(render)(request, 'myapp/index_new.html', context)
+    if etag:
+        response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+@async_login_required
+async def task_page(request):
+    """Render the next page of task rows for infinite scrolling"""
+    params = get_task_list_params(request)
+    overdue = request.GET.get('section') == 'overdue'
+    view = 'missed' if overdue else params['view']
+    category = '' if overdue else params['category']
+    today = timezone.now().date()
+    try:
+        todos, next_cursor = await aget_task_page(request.user, params, today, view, category, params['cursor'])
+    except InvalidCursor:
+        return HttpResponseBadRequest('Invalid cursor.')
+
+    response = await sync_to_async(render)(request, 'myapp/partials/task_page.html', {
+        'todos': todos,
+        'overdue': overdue,
+        'today_date': today,
+    })
+    if next_cursor:
+        response['X-Next-Cursor'] = next_cursor
+    return response
+
+
+@async_login_required
+async def toggle_todo(request, todo_id):
+    if request.method == 'POST':
+        if not await Todo.objects.atoggle_completed(todo_id, request.user):
+            raise Http404('No Todo matches the given query.')
+        todo = await Todo.objects.only('id', 'text', 'completed').aget(id=todo_id)
+        if is_ajax(request):
+            return JsonResponse({
+                'id': todo.id,
+                'completed': todo.completed,
+                'counts': await aget_sidebar_counts(request.user),
+            })
+        status = "completed" if todo.completed else "marked as pending"
+        messages.success(request, f'Task "{todo.text}" {status}!')
+    return redirect('home')
+
+
+@async_login_required
+async def delete_todo(request, todo_id):
+    if request.method == 'POST':
+        try:
+            todo = await Todo.objects.aget(id=todo_id, user=request.user)
+        except Todo.DoesNotExist:
+            raise Http404('No Todo matches the given query.')
+        await todo.adelete()
+        if is_ajax(request):
+            return JsonResponse({
+                'id': todo_id,
+                'deleted': True,
+                'counts': await aget_sidebar_counts(request.user),
+            })
+        messages.success(request, f'Task "{todo.text}" deleted successfully!')
+    return redirect('home')
+
+
+@async_login_required
+async def events(request):
+    """Server-Sent Events stream of the user's task changes"""
+    if not live_updates_available(request):
+        raise Http404('Live updates are not available.')
+    last_event_id = request.headers.get('last-event-id') or request.GET.get('last_event_id', '0')
+    try:
+        last_event_id = int(last_event_id)
+    except ValueError:
+        return HttpResponseBadRequest('Invalid event id.')
+    response = StreamingHttpResponse(event_stream(request.user.pk, last_event_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx-style proxies from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,89 @@
+"""Per-user versioned caching for the home page.
+
+Each user has a version token in the cache. Every cached fragment and count
+for that user includes the token in its key, so bumping the version (done
+by receivers.py whenever the user's todos change) makes all of them miss at
+once without having to find and delete individual keys.
+"""
+import hashlib
+import time
+from functools import lru_cache
+from pathlib import Path
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.functional import cached_property
+
+
+def version_key(user_id):
+    return f'todo:version:{user_id}'
+
+
+def get_todo_version(user_id):
+    version = cache.get(version_key(user_id))
+    if version is None:
+        version = str(time.time_ns())
+        cache.set(version_key(user_id), version, None)
+    return version
+
+
+def bump_todo_versions(user_ids):
+    cache.set_many({version_key(user_id): str(time.time_ns()) for user_id in user_ids}, None)
+
+
+def make_key(*parts):
+    """Short, cache-safe key from arbitrary parts (query strings, search terms)"""
+    return hashlib.md5('|'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+@lru_cache(maxsize=None)
+def get_template_version():
+    """Hash of the app's templates and static files, so a deploy changes every page validator"""
+    digest = hashlib.md5()
+    app_dir = Path(__file__).parent
+    paths = [*(app_dir / 'templates').rglob('*.html'), *(app_dir / 'static').rglob('*')]
+    for path in sorted(p for p in paths if p.is_file()):
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def get_cached_sidebar_counts(user, version, today, search_query, compute):
+    key = f"todo:counts:{user.pk}:{make_key(version, today, search_query)}"
+    return cache.get_or_set(key, compute, settings.TODO_FRAGMENT_CACHE_TIMEOUT)
+
+
+def admin_stats_key(today):
+    return f'todo:admin-stats:{today.isoformat()}'
+
+
+def get_cached_admin_stats(today, compute):
+    """Site-wide changelist statistics, shared by every admin for TODO_ADMIN_STATS_TIMEOUT"""
+    return cache.get_or_set(admin_stats_key(today), compute, settings.TODO_ADMIN_STATS_TIMEOUT)
+
+
+def clear_admin_stats(today):
+    cache.delete(admin_stats_key(today))
+
+
+class LazyTaskPage:
+    """One page of a task list, only queried if a template actually renders it"""
+
+    def __init__(self, loader):
+        self._loader = loader
+
+    @cached_property
+    def _page(self):
+        return self._loader()
+
+    async def aload(self):
+        """Run the query now, e.g. alongside other queries in an async view"""
+        await sync_to_async(lambda: self._page)()
+
+    @property
+    def todos(self):
+        return self._page[0]
+
+    @property
+    def next_cursor(self):
+        return self._page[1]
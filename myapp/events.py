@@ -0,0 +1,140 @@
+"""Per-user change feed for the live-update stream.
+
+receivers.py publishes one event per user for every committed transaction
+that touched their todos. Events are numbered by a per-user sequence and
+stored in the cache, so a stream served by any worker sees writes made by
+every other worker (given a shared cache, see CACHES in settings). Old
+events expire after ``TODO_EVENT_TTL`` seconds; a client that falls further
+behind gets a ``resync`` event and reloads its task lists.
+"""
+import asyncio
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from .models import Todo, TodoCounters
+
+EVENT_FIELDS = ['id', 'user_id', 'text', 'completed', 'category', 'priority', 'due_date', 'due_time']
+
+# Most events replayed to a reconnecting client before it is told to resync
+MAX_REPLAY = 100
+
+# Seconds between keep-alive comments, below the usual 55-60s proxy idle timeout
+KEEPALIVE_INTERVAL = 15
+
+
+def live_updates_available(request):
+    """Whether ``request`` can be served the event stream.
+
+    Besides TODO_LIVE_UPDATES, it needs an ASGI server: under WSGI Django
+    reads the whole never-ending stream before responding, which ties up a
+    worker for TODO_EVENT_STREAM_TIMEOUT.
+    """
+    return settings.TODO_LIVE_UPDATES and isinstance(request, ASGIRequest)
+
+
+def sequence_key(user_id):
+    return f'todo:events:{user_id}'
+
+
+def event_key(user_id, sequence):
+    return f'todo:events:{user_id}:{sequence}'
+
+
+def get_last_event_id(user_id):
+    return cache.get(sequence_key(user_id), 0)
+
+
+def next_event_id(user_id):
+    cache.add(sequence_key(user_id), 0, None)
+    return cache.incr(sequence_key(user_id))
+
+
+def serialize_row(row):
+    row = {field: row[field] for field in EVENT_FIELDS if field != 'user_id'}
+    row['priority_key'] = Todo.PRIORITY_KEYS.get(row['priority'], 'medium')
+    return row
+
+
+def get_event_counts(user_ids):
+    if settings.TODO_COUNTER_TABLE:
+        return {counters.user_id: counters.as_dict() for counters in TodoCounters.objects.filter(user_id__in=user_ids)}
+    return {user_id: Todo.objects.filter(user_id=user_id).sidebar_counts() for user_id in user_ids}
+
+
+def publish_changes(created, updated, deleted, reset=()):
+    """Publish one event per affected user.
+
+    ``created`` and ``updated`` are collections of todo ids, ``deleted``
+    maps todo ids to the id of the user that owned them. Users in ``reset``
+    get a resync event instead, since too many of their todos changed.
+    """
+    rows = Todo.objects.filter(pk__in=[*created, *updated]).values(*EVENT_FIELDS)
+    events = {}
+
+    def user_event(user_id):
+        return events.setdefault(user_id, {'created': [], 'updated': [], 'deleted': []})
+
+    for row in rows:
+        user_event(row['user_id'])['created' if row['id'] in created else 'updated'].append(serialize_row(row))
+    for pk, user_id in deleted.items():
+        user_event(user_id)['deleted'].append(pk)
+    for user_id in reset:
+        events[user_id] = {'resync': True}
+    if not events:
+        return
+    counts = get_event_counts(events.keys())
+    for user_id, event in events.items():
+        event['counts'] = counts.get(user_id)
+        cache.set(event_key(user_id, next_event_id(user_id)), event, settings.TODO_EVENT_TTL)
+
+
+def format_event(name, data, event_id=None):
+    lines = [f'event: {name}', f'data: {json.dumps(data, cls=DjangoJSONEncoder)}']
+    if event_id is not None:
+        lines.insert(0, f'id: {event_id}')
+    return '\n'.join(lines) + '\n\n'
+
+
+async def event_stream(user_id, last_event_id):
+    """Server-Sent Events for one user, starting after ``last_event_id``.
+
+    The stream ends after ``TODO_EVENT_STREAM_TIMEOUT`` seconds and the
+    browser reconnects with a Last-Event-ID header, which keeps abandoned
+    streams from living forever.
+    """
+    yield 'retry: 3000\n\n'
+    deadline = time.monotonic() + settings.TODO_EVENT_STREAM_TIMEOUT
+    last_sent = time.monotonic()
+    while time.monotonic() < deadline:
+        current = await cache.aget(sequence_key(user_id), 0)
+        if current < last_event_id or current - last_event_id > MAX_REPLAY:
+            # The cache was cleared or the client is too far behind to replay
+            yield format_event('resync', {}, current)
+            last_event_id = current
+            last_sent = time.monotonic()
+        elif current > last_event_id:
+            sequences = range(last_event_id + 1, current + 1)
+            events = await cache.aget_many([event_key(user_id, sequence) for sequence in sequences])
+            for sequence in sequences:
+                event = events.get(event_key(user_id, sequence))
+                if event is None and sequence == current:
+                    # Numbered but not stored yet; pick it up on the next poll
+                    break
+                if event is None:
+                    yield format_event('resync', {}, current)
+                    last_event_id = current
+                    break
+                if event.get('resync'):
+                    yield format_event('resync', {}, sequence)
+                else:
+                    yield format_event('changes', event, sequence)
+                last_event_id = sequence
+            last_sent = time.monotonic()
+        elif time.monotonic() - last_sent > KEEPALIVE_INTERVAL:
+            yield ': keepalive\n\n'
+            last_sent = time.monotonic()
+        await asyncio.sleep(settings.TODO_EVENT_POLL_INTERVAL)
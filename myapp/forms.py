@@ -48,6 +48,13 @@ class TodoForm(forms.ModelForm):
             })
         }
 
+class TodoImportForm(TodoForm):
+    """TodoForm for one imported row, which may also say whether the task is done"""
+    completed = forms.BooleanField(required=False)
+    
+    class Meta(TodoForm.Meta):
+        fields = TodoForm.Meta.fields + ['completed']
+
 class CustomUserCreationForm(UserCreationForm):
     first_name = forms.CharField(max_length=30, required=True, widget=forms.TextInput(attrs={
         'class': 'form-control',
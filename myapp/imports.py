@@ -0,0 +1,110 @@
+"""Bulk import of todos from CSV or NDJSON files.
+
+The file is decoded and parsed one line at a time, so an upload of any size
+is never held in memory. Each row is validated with TodoImportForm
+(TodoForm's rules, plus an optional ``completed`` column), and the valid
+rows are inserted with bulk_create(), one transaction per batch. Rows that
+fail are skipped and reported by line number, which means the rest of the
+file still goes in. CSV files need a header row; the columns are the ones
+the export writes, and unknown columns such as ``id`` are ignored.
+"""
+import codecs
+import csv
+import json
+from pathlib import Path
+
+from .forms import TodoImportForm
+from .models import Todo
+
+IMPORT_FORMATS = ['csv', 'ndjson']
+
+# Columns that fall back to the model's default when missing or blank, since
+# other tools rarely have an equivalent
+DEFAULTED_FIELDS = ['priority', 'category']
+
+# Most row errors listed in a report; later failures are only counted
+MAX_REPORTED_ERRORS = 1000
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+def detect_format(filename, requested=None):
+    """The import format asked for, or else the one named by the file's extension"""
+    import_format = requested or Path(filename or '').suffix.lstrip('.').lower()
+    if import_format == 'jsonl':
+        import_format = 'ndjson'
+    if import_format not in IMPORT_FORMATS:
+        raise ImportFormatError(f"Unknown format. Choose from: {', '.join(IMPORT_FORMATS)}.")
+    return import_format
+
+
+def csv_rows(lines):
+    reader = csv.DictReader(codecs.iterdecode(lines, 'utf-8-sig'))
+    if not reader.fieldnames:
+        raise ImportFormatError('The CSV file needs a header row.')
+    for row in reader:
+        yield reader.line_num, row
+
+
+def ndjson_rows(lines):
+    for line_number, line in enumerate(codecs.iterdecode(lines, 'utf-8'), 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield line_number, row if isinstance(row, dict) else None
+
+
+def read_rows(lines, import_format):
+    """``(line number, row dict)`` for each row of a binary file; the row is None if unreadable"""
+    return csv_rows(lines) if import_format == 'csv' else ndjson_rows(lines)
+
+
+def validate_row(row):
+    """TodoImportForm bound to one row, with defaults filled in"""
+    data = {name: value for name, value in row.items() if name in TodoImportForm.Meta.fields}
+    for name in DEFAULTED_FIELDS:
+        if data.get(name) in (None, ''):
+            data[name] = Todo._meta.get_field(name).get_default()
+    return TodoImportForm(data)
+
+
+def import_todos(user, rows, batch_size):
+    """Create a todo for ``user`` from each valid row; returns the report.
+
+    The report has the number of todos ``created`` and rows ``failed``, and
+    ``errors``: the first MAX_REPORTED_ERRORS failures as
+    ``{'line': n, 'errors': {field: [messages]}}``.
+    """
+    report = {'created': 0, 'failed': 0, 'errors': []}
+    batch = []
+    try:
+        for line_number, row in rows:
+            if row is None:
+                errors = {'__all__': ['Could not read this line.']}
+            else:
+                form = validate_row(row)
+                if form.is_valid():
+                    todo = form.save(commit=False)
+                    todo.user = user
+                    batch.append(todo)
+                    if len(batch) >= batch_size:
+                        Todo.objects.bulk_create(batch)
+                        report['created'] += len(batch)
+                        batch = []
+                    continue
+                errors = {name: list(messages) for name, messages in form.errors.items()}
+            report['failed'] += 1
+            if len(report['errors']) < MAX_REPORTED_ERRORS:
+                report['errors'].append({'line': line_number, 'errors': errors})
+    except (ImportFormatError, UnicodeDecodeError, csv.Error) as e:
+        # Rows before the damage are kept; the report says where it stopped
+        report['error'] = f'Stopped reading the file: {e}'
+    if batch:
+        Todo.objects.bulk_create(batch)
+        report['created'] += len(batch)
+    return report
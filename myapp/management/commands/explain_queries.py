@@ -0,0 +1,77 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from myapp.models import Todo, TodoChange
+from myapp.pagination import keyset_filter, order_by_expressions
+
+
+class Command(BaseCommand):
+    help = "Print the database query plan for every hot query, optionally checking the indexes it uses"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Username whose todos are explained (defaults to the first user)')
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Fail unless every plan uses the index listed for it in docs/performance/query_plans.md',
+        )
+
+    def get_queries(self, user):
+        """``(label, queryset, indexes)``: any one of ``indexes`` should be in the plan"""
+        today = timezone.now().date()
+        user_todos = Todo.objects.filter(user=user)
+        default_ordering = Todo.SORT_ORDERINGS['']
+
+        def page(queryset, ordering=default_ordering):
+            return queryset.order_by(*order_by_expressions(Todo, ordering))[:51]
+
+        first = page(user_todos.for_view('upcoming', '', today)).first()
+        next_page = user_todos.for_view('upcoming', '', today)
+        if first is not None:
+            next_page = next_page.filter(keyset_filter(Todo, default_ordering, [first.due_date, first.created_at, first.id]))
+        return [
+            ('home: today page', page(user_todos.for_view('', '', today).with_bucket(today)), ['todo_user_due_created_idx']),
+            ('home: upcoming page', page(user_todos.for_view('upcoming', '', today)), ['todo_user_due_created_idx']),
+            ('home: upcoming next page (keyset)', page(next_page), ['todo_user_due_created_idx']),
+            (
+                'home: sidebar counts',
+                user_todos.values('user').annotate(**user_todos.sidebar_count_expressions(today)),
+                # Any index that leads with user_id, including the foreign key's own
+                ['myapp_todo_user_id_', 'todo_user_completed_idx', 'todo_user_due_created_idx'],
+            ),
+            ('home: category page', page(user_todos.for_view('', 'work', today)), ['todo_user_due_created_idx', 'todo_user_category_idx']),
+            ('home: completed page', page(user_todos.for_view('completed', '', today)), ['todo_user_due_created_idx', 'todo_user_completed_idx']),
+            ('home: priority sort', page(user_todos, Todo.SORT_ORDERINGS['priority']), ['todo_user_priority_due_idx']),
+            ('home: missed page', page(user_todos.for_view('missed', '', today)), ['todo_user_due_created_idx', 'todo_user_open_due_idx']),
+            ('sync: changes since a cursor', TodoChange.objects.filter(user=user, id__gt=0).order_by('id')[:1000], ['todochange_user_id_idx']),
+            ('reminders: due batch', Todo.objects.due_reminders()[:100], ['todo_next_reminder_idx']),
+            ('admin: changelist page', Todo.objects.order_by('-created_at')[:100], ['todo_created_desc_idx']),
+            ('admin: completed filter', Todo.objects.filter(completed=True).order_by('-created_at')[:100], ['todo_created_desc_idx']),
+            # Aggregates cannot be explained directly, so explain the single
+            # scan over the aggregated columns that admin_stats() makes instead.
+            ('admin: statistics', Todo.objects.order_by().values('completed', 'priority', 'due_date'), []),
+        ]
+
+    def handle(self, *args, **options):
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+        else:
+            user = User.objects.order_by('pk').first()
+        if user is None:
+            raise CommandError('No user found to explain queries for.')
+
+        missing = []
+        self.stdout.write(f"# Query plans ({connection.vendor})\n")
+        for label, queryset, indexes in self.get_queries(user):
+            plan = queryset.explain()
+            self.stdout.write(f"## {label}\n")
+            self.stdout.write("```sql")
+            self.stdout.write(str(queryset.query))
+            self.stdout.write("```\n")
+            self.stdout.write("```")
+            self.stdout.write(plan)
+            self.stdout.write("```\n")
+            if indexes and not any(index in plan for index in indexes):
+                missing.append(f"{label} (expected {' or '.join(indexes)})")
+        if options['check'] and missing:
+            raise CommandError(f"Plans without their expected index: {'; '.join(missing)}.")
@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from myapp.imports import ImportFormatError, detect_format, import_todos, read_rows
+
+
+class Command(BaseCommand):
+    help = "Import todos for a user from a CSV or NDJSON file, reporting the rows that fail validation"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV (with a header row) or NDJSON file')
+        parser.add_argument('--user', required=True, help='Username that will own the todos')
+        parser.add_argument('--format', choices=['csv', 'ndjson'], help="File format (default: from the file's extension)")
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.TODO_IMPORT_BATCH_SIZE,
+            help='Valid rows inserted per transaction',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {options['user']!r}.")
+        try:
+            import_format = detect_format(options['path'], options['format'])
+        except ImportFormatError as e:
+            raise CommandError(str(e))
+        try:
+            with open(options['path'], 'rb') as lines:
+                report = import_todos(user, read_rows(lines, import_format), options['batch_size'])
+        except OSError as e:
+            raise CommandError(f"Could not read {options['path']}: {e}")
+
+        for failure in report['errors']:
+            messages = '; '.join(
+                f"{name}: {' '.join(errors)}" if name != '__all__' else ' '.join(errors)
+                for name, errors in failure['errors'].items()
+            )
+            self.stderr.write(f"Line {failure['line']}: {messages}")
+        if report['failed'] > len(report['errors']):
+            self.stderr.write(f"...and {report['failed'] - len(report['errors'])} more rows with errors.")
+        if 'error' in report:
+            self.stderr.write(self.style.ERROR(report['error']))
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report['created']} todos for {user.username}; {report['failed']} rows failed."
+        ))
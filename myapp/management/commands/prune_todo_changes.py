@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+from django.utils import timezone
+from myapp.models import TodoChange
+
+
+class Command(BaseCommand):
+    help = "Delete delta sync change log entries older than the retention period"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.TODO_CHANGE_LOG_RETENTION_DAYS,
+            help="Keep entries from the last N days",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        # Delete a prefix of ids, so clients with an older cursor are told to reset
+        last_id = TodoChange.objects.filter(changed_at__lt=cutoff).aggregate(last_id=Max('id'))['last_id']
+        if last_id is None:
+            self.stdout.write("No change log entries to prune.")
+            return
+        deleted, _ = TodoChange.objects.filter(id__lte=last_id).delete()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} change log entries up to #{last_id}."))
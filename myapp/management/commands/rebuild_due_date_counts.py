@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from myapp.models import TodoDueDateCount
+
+
+class Command(BaseCommand):
+    help = "Correct the per-date todo counts behind the TodoAdmin date hierarchy; schedule it, e.g. nightly"
+
+    def handle(self, *args, **options):
+        fixed = TodoDueDateCount.reconcile()
+        self.stdout.write(self.style.SUCCESS(f"Corrected the counts of {fixed} due dates."))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from myapp.search import BACKENDS, LikeSearchBackend
+
+
+class Command(BaseCommand):
+    help = "Recreate and repopulate the full-text search index for todos"
+
+    def handle(self, *args, **options):
+        backend = BACKENDS.get(connection.vendor, LikeSearchBackend)()
+        if type(backend) is LikeSearchBackend:
+            self.stdout.write(f"No full-text index for {connection.vendor}; searches use LIKE.")
+            return
+        backend.rebuild(connection)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt the {backend.name} search index."))
@@ -0,0 +1,84 @@
+import random
+from datetime import time, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from myapp.models import Todo
+
+VERBS = ['Finish', 'Review', 'Call', 'Email', 'Buy', 'Plan', 'Clean', 'Book', 'Write', 'Fix', 'Pay', 'Prepare']
+SUBJECTS = [
+    'quarterly report', 'dentist', 'groceries', 'team meeting', 'car service', 'birthday present',
+    'tax return', 'garden', 'project proposal', 'gym session', 'electricity bill', 'holiday flights',
+    'kitchen', 'presentation slides', 'insurance renewal', 'client invoice',
+]
+CATEGORY_WEIGHTS = {'work': 45, 'home': 25, 'personal': 30}
+PRIORITY_WEIGHTS = {Todo.LOW: 30, Todo.MEDIUM: 50, Todo.HIGH: 20}
+
+
+class Command(BaseCommand):
+    help = "Create users and todos with realistic due dates, categories and priorities for load testing"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10, help='Number of users (default 10)')
+        parser.add_argument('--todos', type=int, default=100, help='Todos added per user (default 100)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk_create (default 1000)')
+        parser.add_argument(
+            '--prefix', default='seed',
+            help='Username prefix; users that already exist are reused and get more todos (default "seed")',
+        )
+        parser.add_argument('--password', default='password', help='Password for new users (default "password")')
+        parser.add_argument('--seed', type=int, help='Random seed, for repeatable data')
+
+    def get_users(self, count, prefix, password):
+        usernames = [f'{prefix}{i:04d}' for i in range(1, count + 1)]
+        existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+        # Hashing is deliberately slow, so every new user shares one hash
+        password_hash = make_password(password)
+        User.objects.bulk_create([
+            User(username=username, email=f'{username}@example.com', password=password_hash)
+            for username in usernames if username not in existing
+        ])
+        return list(User.objects.filter(username__in=usernames).order_by('pk'))
+
+    def make_todo(self, rng, user, today):
+        roll = rng.random()
+        if roll < 0.15:
+            due_date = None
+        elif roll < 0.30:
+            due_date = today - timedelta(days=rng.randint(1, 30))
+        elif roll < 0.40:
+            due_date = today
+        else:
+            # Most upcoming work is due within the next couple of weeks
+            due_date = today + timedelta(days=min(int(rng.expovariate(1 / 10)) + 1, 365))
+        overdue = due_date is not None and due_date < today
+        return Todo(
+            user=user,
+            text=f'{rng.choice(VERBS)} {rng.choice(SUBJECTS)}',
+            completed=rng.random() < (0.7 if overdue else 0.2),
+            due_date=due_date,
+            due_time=time(rng.randint(7, 20), rng.choice([0, 15, 30, 45])) if due_date and rng.random() < 0.4 else None,
+            priority=rng.choices(list(PRIORITY_WEIGHTS), weights=list(PRIORITY_WEIGHTS.values()))[0],
+            category=rng.choices(list(CATEGORY_WEIGHTS), weights=list(CATEGORY_WEIGHTS.values()))[0],
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        today = timezone.now().date()
+        users = self.get_users(options['users'], options['prefix'], options['password'])
+        todos = (self.make_todo(rng, user, today) for user in users for _ in range(options['todos']))
+
+        created = 0
+        batch_size = options['batch_size']
+        while True:
+            batch = [todo for _, todo in zip(range(batch_size), todos)]
+            if not batch:
+                break
+            Todo.objects.bulk_create(batch)
+            created += len(batch)
+            self.stdout.write(f'{created} todos created...', ending='\r')
+            self.stdout.flush()
+
+        self.stdout.write(self.style.SUCCESS(f'Created {created} todos for {len(users)} users.'))
@@ -0,0 +1,37 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from myapp.reminders import send_due_reminders
+
+
+class Command(BaseCommand):
+    help = "Email reminders for todos that are about to fall due; safe to run several at once"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.TODO_REMINDER_BATCH_SIZE,
+            help="Reminders claimed per transaction",
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help="Keep polling for due reminders instead of exiting once none are left",
+        )
+        parser.add_argument(
+            '--interval', type=float, default=settings.TODO_REMINDER_POLL_INTERVAL,
+            help="Seconds between polls with --loop",
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            claimed, sent = send_due_reminders(options['batch_size'])
+            total += sent
+            if claimed and options['verbosity'] > 1:
+                self.stdout.write(f"Sent {sent} of {claimed} claimed reminders.")
+            if claimed == options['batch_size']:
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(f"Sent {total} reminders."))
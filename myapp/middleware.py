@@ -0,0 +1,115 @@
+import cProfile
+import json
+import logging
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from .metrics import QueryBudgetExceeded, end_request, start_request
+from .profiling import get_profile_store
+
+logger = logging.getLogger('myapp.metrics')
+
+
+class RequestMetricsMiddleware:
+    """Report query count, SQL, template and total time for every request.
+
+    The numbers go out in a ``Server-Timing`` header and one structured log
+    line, at DEBUG, on the ``myapp.metrics`` logger. Views listed in
+    ``TODO_QUERY_BUDGETS`` (by URL name, or by method and URL name such as
+    ``'POST admin:myapp_todo_changelist'``) log a warning when they run more
+    queries than their budget, or raise QueryBudgetExceeded when
+    ``TODO_QUERY_BUDGET_STRICT`` is on, which fails the test that made the
+    request.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics, token = start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            end_request(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics, token = start_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            end_request(token)
+        return self.finish(request, response, metrics)
+
+    def finish(self, request, response, metrics):
+        response['Server-Timing'] = metrics.server_timing()
+        match = request.resolver_match
+        view_name = match.view_name if match else None
+        data = {
+            'method': request.method,
+            'path': request.path,
+            'view': view_name,
+            'status': response.status_code,
+            **metrics.as_dict(),
+        }
+        logger.debug('request %s', json.dumps(data), extra=data)
+        budgets = settings.TODO_QUERY_BUDGETS
+        budget = budgets.get(f'{request.method} {view_name}', budgets.get(view_name))
+        if budget is not None and metrics.queries > budget:
+            message = f'{view_name} ran {metrics.queries} queries, over its budget of {budget}'
+            if settings.TODO_QUERY_BUDGET_STRICT:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message, extra=data)
+        return response
+
+
+class ProfilingMiddleware:
+    """Profile a staff member's request with cProfile when they ask for it.
+
+    A request opts in with ``?profile=1`` or an ``X-Profile: 1`` header, and
+    ``TODO_PROFILE_SAMPLE_RATE`` of those are profiled. The stats go to the
+    ProfileStore and the response names them in an ``X-Profile-Id`` header.
+    Unless ``TODO_PROFILING`` is on the middleware is removed at startup.
+    """
+
+    def __init__(self, get_response):
+        if not settings.TODO_PROFILING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.store = get_profile_store()
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        response = profiler.runcall(self.get_response, request)
+        duration = time.perf_counter() - start
+        match = request.resolver_match
+        response['X-Profile-Id'] = self.store.save(profiler, {
+            'method': request.method,
+            'path': request.get_full_path(),
+            'view': match.view_name if match else None,
+            'user': request.user.get_username(),
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 2),
+            'captured_at': time.time(),
+        })
+        return response
+
+    def should_profile(self, request):
+        requested = request.GET.get('profile') == '1' or request.headers.get('X-Profile') == '1'
+        return (
+            requested
+            and request.user.is_staff
+            and random.random() < settings.TODO_PROFILE_SAMPLE_RATE
+        )
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.24 on 2026-10-18 02:11
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('myapp', '0004_todo_category'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TodoCounters',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='todo_counters', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('as_of', models.DateField()),
+                ('today_count', models.PositiveIntegerField(default=0)),
+                ('upcoming_count', models.PositiveIntegerField(default=0)),
+                ('completed_count', models.PositiveIntegerField(default=0)),
+                ('missed_count', models.PositiveIntegerField(default=0)),
+                ('personal_count', models.PositiveIntegerField(default=0)),
+                ('work_count', models.PositiveIntegerField(default=0)),
+                ('home_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'todo counters',
+            },
+        ),
+    ]
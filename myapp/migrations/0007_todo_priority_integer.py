@@ -0,0 +1,62 @@
+from django.db import migrations, models
+
+
+PRIORITY_LEVELS = {
+    'low': 1,
+    'medium': 2,
+    'high': 3,
+}
+
+
+def priority_to_integer(apps, schema_editor):
+    Todo = apps.get_model('myapp', 'Todo')
+    for name, level in PRIORITY_LEVELS.items():
+        Todo.objects.filter(priority=name).update(priority_level=level)
+
+
+def priority_to_string(apps, schema_editor):
+    Todo = apps.get_model('myapp', 'Todo')
+    for name, level in PRIORITY_LEVELS.items():
+        Todo.objects.filter(priority_level=level).update(priority=name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0006_todo_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='todo',
+            name='todo_priority_idx',
+        ),
+        migrations.AddField(
+            model_name='todo',
+            name='priority_level',
+            field=models.PositiveSmallIntegerField(default=2),
+        ),
+        migrations.RunPython(priority_to_integer, priority_to_string),
+        migrations.RemoveField(
+            model_name='todo',
+            name='priority',
+        ),
+        migrations.RenameField(
+            model_name='todo',
+            old_name='priority_level',
+            new_name='priority',
+        ),
+        migrations.AlterField(
+            model_name='todo',
+            name='priority',
+            field=models.PositiveSmallIntegerField(choices=[(1, 'Low'), (2, 'Medium'), (3, 'High')], default=2),
+        ),
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(fields=['priority'], name='todo_priority_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(fields=['user', '-priority', 'due_date', '-created_at'], name='todo_user_priority_due_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.24 on 2026-10-18 02:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0007_todo_priority_integer'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='todo',
+            name='todo_user_due_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='todo',
+            name='todo_user_priority_due_idx',
+        ),
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(fields=['user', 'due_date', '-created_at', '-id'], name='todo_user_due_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(fields=['user', '-priority', 'due_date', '-created_at', '-id'], name='todo_user_priority_due_idx'),
+        ),
+    ]
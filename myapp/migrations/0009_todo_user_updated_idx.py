@@ -0,0 +1,17 @@
+# Generated by Django 4.2.24 on 2026-10-18 02:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0008_todo_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(fields=['user', 'updated_at'], name='todo_user_updated_idx'),
+        ),
+    ]
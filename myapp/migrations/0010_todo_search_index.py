@@ -0,0 +1,32 @@
+from django.db import migrations
+
+
+def install_search_index(apps, schema_editor):
+    from myapp.search import BACKENDS
+
+    backend_class = BACKENDS.get(schema_editor.connection.vendor)
+    if backend_class is not None:
+        backend_class().install(schema_editor.connection)
+
+
+def remove_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    with schema_editor.connection.cursor() as cursor:
+        if vendor == 'sqlite':
+            for trigger in ('myapp_todo_fts_ai', 'myapp_todo_fts_ad', 'myapp_todo_fts_au'):
+                cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+            cursor.execute("DROP TABLE IF EXISTS myapp_todo_fts")
+        elif vendor == 'postgresql':
+            cursor.execute("DROP INDEX IF EXISTS todo_search_vector_idx")
+            cursor.execute("ALTER TABLE myapp_todo DROP COLUMN IF EXISTS search_vector")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0009_todo_user_updated_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search_index, remove_search_index),
+    ]
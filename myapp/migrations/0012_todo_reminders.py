@@ -0,0 +1,64 @@
+# Generated by Django 4.2.24 on 2026-10-18 02:41
+
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+BATCH_SIZE = 1000
+
+
+def next_reminder_at(due_date, due_time, now):
+    """get_next_reminder_at() as of this migration, for open todos never reminded"""
+    default_time = time.fromisoformat(settings.TODO_REMINDER_DEFAULT_TIME)
+    due_at = timezone.make_aware(datetime.combine(due_date, due_time or default_time))
+    if due_at <= now:
+        return None
+    return due_at - timedelta(minutes=settings.TODO_REMINDER_LEAD_MINUTES)
+
+
+def schedule_open_todos(apps, schema_editor):
+    Todo = apps.get_model('myapp', 'Todo')
+    now = timezone.now()
+    todos = Todo.objects.filter(completed=False, due_date__gte=now.date() - timedelta(days=1)).only('due_date', 'due_time')
+    last_pk = 0
+    while True:
+        # Batches by primary key, so no cursor is left open while writing
+        batch = list(todos.filter(pk__gt=last_pk).order_by('pk')[:BATCH_SIZE])
+        if not batch:
+            break
+        last_pk = batch[-1].pk
+        scheduled = []
+        for todo in batch:
+            todo.next_reminder_at = next_reminder_at(todo.due_date, todo.due_time, now)
+            if todo.next_reminder_at is not None:
+                scheduled.append(todo)
+        Todo.objects.bulk_update(scheduled, ['next_reminder_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0011_todochange'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='todo',
+            name='next_reminder_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='todo',
+            name='reminder_sent_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='todo',
+            index=models.Index(condition=models.Q(('next_reminder_at__isnull', False)), fields=['next_reminder_at'], name='todo_next_reminder_idx'),
+        ),
+        # Nullable columns without a default are added with ALTER TABLE ADD
+        # COLUMN on SQLite too, so the full-text search triggers survive
+        migrations.RunPython(schedule_open_todos, migrations.RunPython.noop),
+    ]
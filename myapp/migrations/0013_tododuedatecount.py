@@ -0,0 +1,34 @@
+# Generated by Django 4.2.24 on 2026-10-18 02:49
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_due_dates(apps, schema_editor):
+    Todo = apps.get_model('myapp', 'Todo')
+    TodoDueDateCount = apps.get_model('myapp', 'TodoDueDateCount')
+    rows = Todo.objects.order_by().exclude(due_date=None).values_list('due_date').annotate(count=Count('id'))
+    TodoDueDateCount.objects.bulk_create(
+        [TodoDueDateCount(due_date=due_date, count=count) for due_date, count in rows.iterator()], batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0012_todo_reminders'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TodoDueDateCount',
+            fields=[
+                ('due_date', models.DateField(primary_key=True, serialize=False)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'todo due date count',
+            },
+        ),
+        migrations.RunPython(count_due_dates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.24 on 2026-10-18 03:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0013_tododuedatecount'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='todochange',
+            name='reset',
+            field=models.BooleanField(default=False),
+        ),
+    ]
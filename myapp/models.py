@@ -1,17 +1,270 @@
-from django.db import models
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Case, CharField, Count, ExpressionWrapper, F, Max, Q, Value, When
 from django.contrib.auth.models import User
 from django.utils import timezone
-from datetime import datetime, timedelta
+from datetime import datetime, time, timedelta
+from .signals import todos_bulk_created, todos_bulk_updated
 
 # Create your models here.
 
+# Changing any of these can move or cancel a todo's reminder
+REMINDER_FIELDS = {'completed', 'due_date', 'due_time'}
+
+
+def get_next_reminder_at(due_date, due_time, completed, reminder_sent_at, now=None):
+    """When to remind the owner about a todo, or None if no reminder is due.
+
+    Reminders go out ``TODO_REMINDER_LEAD_MINUTES`` before the due time (or
+    ``TODO_REMINDER_DEFAULT_TIME`` for todos without one) and only once per
+    due time: a reminder already sent for this or a later schedule is not
+    repeated. Todos that are completed or already past due get none.
+    """
+    if completed or due_date is None:
+        return None
+    now = now or timezone.now()
+    due_at = timezone.make_aware(datetime.combine(due_date, due_time or time.fromisoformat(settings.TODO_REMINDER_DEFAULT_TIME)))
+    if due_at <= now:
+        return None
+    remind_at = due_at - timedelta(minutes=settings.TODO_REMINDER_LEAD_MINUTES)
+    if reminder_sent_at is not None and reminder_sent_at >= remind_at:
+        return None
+    return remind_at
+
+class TodoQuerySet(models.QuerySet):
+    def sidebar_count_expressions(self, today=None):
+        """Conditional Count() expressions for every sidebar counter"""
+        today = today or timezone.now().date()
+        tomorrow = today + timedelta(days=1)
+        return {
+            'today_count': Count('id', filter=Q(due_date=today) | Q(due_date__isnull=True, created_at__date=today)),
+            'upcoming_count': Count('id', filter=Q(due_date__gt=tomorrow)),
+            'completed_count': Count('id', filter=Q(completed=True)),
+            'missed_count': Count('id', filter=Q(due_date__lt=today, completed=False)),
+            'personal_count': Count('id', filter=Q(category='personal')),
+            'work_count': Count('id', filter=Q(category='work')),
+            'home_count': Count('id', filter=Q(category='home')),
+        }
+    
+    def sidebar_counts(self, today=None):
+        """Return every sidebar counter in a single conditional-aggregation query"""
+        return self.aggregate(**self.sidebar_count_expressions(today))
+    
+    async def asidebar_counts(self, today=None):
+        return await self.aaggregate(**self.sidebar_count_expressions(today))
+    
+    def admin_stats(self, today=None):
+        """Every TodoAdmin changelist statistic in one conditional-aggregation query"""
+        today = today or timezone.now().date()
+        return self.order_by().aggregate(
+            total_todos=Count('id'),
+            completed_todos=Count('id', filter=Q(completed=True)),
+            high_priority=Count('id', filter=Q(priority=Todo.HIGH)),
+            medium_priority=Count('id', filter=Q(priority=Todo.MEDIUM)),
+            low_priority=Count('id', filter=Q(priority=Todo.LOW)),
+            overdue_todos=Count('id', filter=Q(due_date__lt=today, completed=False)),
+            today_todos=Count('id', filter=Q(due_date=today)),
+        )
+    
+    def with_bucket(self, today=None):
+        """Annotate each row with its date bucket relative to ``today``"""
+        today = today or timezone.now().date()
+        tomorrow = today + timedelta(days=1)
+        return self.annotate(bucket=Case(
+            When(due_date=today, then=Value('today')),
+            When(due_date__isnull=True, created_at__date=today, then=Value('today')),
+            When(due_date=tomorrow, then=Value('tomorrow')),
+            When(due_date__gt=tomorrow, then=Value('upcoming')),
+            When(due_date__lt=today, then=Value('past')),
+            default=Value('none'),
+            output_field=CharField(),
+        ))
+    
+    def for_view(self, view='', category='', today=None):
+        """Filter to the rows shown by a home() view or category list"""
+        today = today or timezone.now().date()
+        if category:
+            return self.filter(category=category)
+        if view == 'upcoming':
+            return self.filter(due_date__gt=today + timedelta(days=1))
+        if view == 'completed':
+            return self.filter(completed=True)
+        if view == 'missed':
+            return self.filter(due_date__lt=today, completed=False)
+        return self.filter(Q(due_date=today) | Q(due_date__isnull=True, created_at__date=today))
+    
+    def data_version(self):
+        """Cheap validator for these rows: the latest change plus the row count"""
+        stats = self.order_by().aggregate(latest=Max('updated_at'), count=Count('id'))
+        latest = stats['latest'].isoformat() if stats['latest'] else ''
+        return f"{latest}:{stats['count']}"
+    
+    async def adata_version(self):
+        return await sync_to_async(self.data_version)()
+    
+    def bulk_create(self, objs, *args, **kwargs):
+        """Bulk insert that does what save() would for each todo.
+
+        Reminders are scheduled before the insert, and listeners are sent
+        the new todos, since bulk_create() sends no post_save.
+        """
+        objs = list(objs)
+        for todo in objs:
+            todo.schedule_reminder()
+        with transaction.atomic(using=self.db, savepoint=False):
+            created = super().bulk_create(objs, *args, **kwargs)
+            if created:
+                todos_bulk_created.send(sender=self.model, todos=created)
+        return created
+    
+    def update(self, **kwargs):
+        """Bulk update that notifies listeners which todos and users changed.
+
+        Rows are updated ``TODO_UPDATE_CHUNK_SIZE`` at a time in primary key
+        order, so memory use and the size of each statement stay bounded
+        however many todos match. An update of more than one chunk is sent
+        with ``owners=None`` rather than a mapping of every todo.
+        """
+        chunk_size = settings.TODO_UPDATE_CHUNK_SIZE
+        rows = list(self.order_by('pk').values_list('pk', 'user_id')[:chunk_size])
+        due_date_changes = {}
+        if len(rows) < chunk_size:
+            updated = self._update_chunk(self, rows, kwargs, due_date_changes)
+            if rows:
+                todos_bulk_updated.send(
+                    sender=self.model,
+                    user_ids={user_id for _, user_id in rows},
+                    owners=dict(rows),
+                    due_date_changes=due_date_changes,
+                )
+            return updated
+        
+        updated = 0
+        user_ids = set()
+        owners = dict(rows)
+        with transaction.atomic(using=self.db):
+            while rows:
+                # The original filters, narrowed to this chunk's range of pks
+                chunk = self.filter(pk__gte=rows[0][0], pk__lte=rows[-1][0])
+                updated += self._update_chunk(chunk, rows, kwargs, due_date_changes)
+                user_ids.update(user_id for _, user_id in rows)
+                rows = list(self.filter(pk__gt=rows[-1][0]).order_by('pk').values_list('pk', 'user_id')[:chunk_size])
+                if rows:
+                    owners = None
+            todos_bulk_updated.send(
+                sender=self.model, user_ids=user_ids, owners=owners, due_date_changes=due_date_changes,
+            )
+        return updated
+    
+    def _update_chunk(self, queryset, rows, fields, due_date_changes):
+        """UPDATE ``queryset``, whose matching rows are ``rows``, adding to ``due_date_changes``"""
+        written = self.model.objects.filter(pk__in=[pk for pk, _ in rows])
+        counts_due_dates = bool(rows) and 'due_date' in fields
+        if counts_due_dates:
+            for due_date, delta in written.due_date_deltas(-1).items():
+                due_date_changes[due_date] = due_date_changes.get(due_date, 0) + delta
+        updated = super(TodoQuerySet, queryset).update(**fields)
+        if rows and REMINDER_FIELDS.intersection(fields):
+            written.reschedule_reminders()
+        if counts_due_dates:
+            for due_date, delta in written.due_date_deltas(1).items():
+                due_date_changes[due_date] = due_date_changes.get(due_date, 0) + delta
+        return updated
+    
+    def due_date_deltas(self, sign):
+        """``{due_date: sign * number of these todos due then}``"""
+        rows = self.order_by().exclude(due_date=None).values_list('due_date').annotate(count=Count('id'))
+        return {due_date: sign * count for due_date, count in rows}
+    
+    def toggle_completed(self, todo_id, user):
+        """Flip ``completed`` on one of the user's todos with a single UPDATE"""
+        # The owner is already known, so skip the lookup done by update()
+        updated = self.filter(pk=todo_id, user=user)._toggle_completed()
+        if updated:
+            self.filter(pk=todo_id).reschedule_reminders()
+            todos_bulk_updated.send(sender=self.model, user_ids={user.pk}, owners={todo_id: user.pk})
+        return updated
+    
+    async def atoggle_completed(self, todo_id, user):
+        # Receivers schedule counter and cache refreshes, so run on the sync thread
+        return await sync_to_async(self.toggle_completed)(todo_id, user)
+    
+    def set_reminder(self, **fields):
+        """Update the reminder columns; unlike update() this is not a change to the todos"""
+        return super().update(**fields)
+    
+    def due_reminders(self, now=None):
+        """Todos whose reminder time has passed, oldest first"""
+        return self.filter(next_reminder_at__lte=now or timezone.now()).order_by('next_reminder_at')
+    
+    def reschedule_reminders(self):
+        """Recompute next_reminder_at after a bulk update of due dates or completion.
+
+        Only reminders that appear or move are written. Stale reminders of
+        completed or rescheduled todos are dropped by the send_reminders
+        worker when they come up.
+        """
+        now = timezone.now()
+        rows = self.filter(due_date__gte=now.date() - timedelta(days=1)).values_list(
+            'pk', 'due_date', 'due_time', 'completed', 'reminder_sent_at', 'next_reminder_at',
+        )
+        changed = []
+        for pk, due_date, due_time, completed, reminder_sent_at, current in rows:
+            remind_at = get_next_reminder_at(due_date, due_time, completed, reminder_sent_at, now)
+            if remind_at is not None and remind_at != current:
+                changed.append(self.model(pk=pk, next_reminder_at=remind_at))
+        if changed:
+            # A plain QuerySet, since bulk_update() goes through update()
+            models.QuerySet(self.model, using=self.db).bulk_update(changed, ['next_reminder_at'])
+    
+    def apply_batch(self, operation, value=None):
+        """Apply a batch operation with a single UPDATE or DELETE; returns the affected count"""
+        now = timezone.now()
+        if operation == 'complete':
+            return self.update(completed=True, updated_at=now)
+        if operation == 'uncomplete':
+            return self.update(completed=False, updated_at=now)
+        if operation == 'delete':
+            return self.delete()[1].get(self.model._meta.label, 0)
+        if operation == 'set_priority':
+            return self.update(priority=value, updated_at=now)
+        if operation == 'set_category':
+            return self.update(category=value, updated_at=now)
+        if operation == 'shift_due_date':
+            shifted = ExpressionWrapper(F('due_date') + timedelta(days=value), output_field=models.DateField())
+            return self.filter(due_date__isnull=False).update(due_date=shifted, updated_at=now)
+        raise ValueError(f'Unknown batch operation: {operation}')
+    
+    def _toggle_completed(self):
+        return super().update(completed=~F('completed'), updated_at=timezone.now())
+
+
 class Todo(models.Model):
+    # Priorities are stored as small integers so they sort in the database
+    LOW = 1
+    MEDIUM = 2
+    HIGH = 3
+    
     PRIORITY_CHOICES = [
-        ('low', 'Low'),
-        ('medium', 'Medium'), 
-        ('high', 'High'),
+        (LOW, 'Low'),
+        (MEDIUM, 'Medium'), 
+        (HIGH, 'High'),
     ]
     
+    PRIORITY_KEYS = {
+        LOW: 'low',
+        MEDIUM: 'medium',
+        HIGH: 'high',
+    }
+    
+    # ?sort= modes accepted by home(); each ends in a unique key for keyset pagination
+    SORT_ORDERINGS = {
+        '': ['due_date', '-created_at', '-id'],
+        'priority': ['-priority', 'due_date', '-created_at', '-id'],
+        'due': ['due_date', '-priority', '-created_at', '-id'],
+    }
+    
     CATEGORY_CHOICES = [
         ('work', 'Work'),
         ('home', 'Home'),
@@ -23,22 +276,51 @@ class Todo(models.Model):
     completed = models.BooleanField(default=False)
     due_date = models.DateField(null=True, blank=True)
     due_time = models.TimeField(null=True, blank=True)
-    priority = models.CharField(max_length=10, choices=PRIORITY_CHOICES, default='medium')
+    priority = models.PositiveSmallIntegerField(choices=PRIORITY_CHOICES, default=MEDIUM)
     category = models.CharField(max_length=10, choices=CATEGORY_CHOICES, default='personal')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Maintained by save() and reschedule_reminders(), consumed by send_reminders
+    next_reminder_at = models.DateTimeField(null=True, blank=True, editable=False)
+    reminder_sent_at = models.DateTimeField(null=True, blank=True, editable=False)
+    
+    objects = TodoQuerySet.as_manager()
     
     def __str__(self):
         return f"{self.user.username}: {self.text}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remembered so receivers.py can move a saved todo between TodoDueDateCount rows
+        if 'due_date' in field_names:
+            instance._loaded_due_date = instance.due_date
+        return instance
+    
+    def save(self, *args, **kwargs):
+        self.schedule_reminder()
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'next_reminder_at'}
+        super().save(*args, **kwargs)
+    
+    def schedule_reminder(self):
+        """Set next_reminder_at from the due date"""
+        self.next_reminder_at = get_next_reminder_at(
+            self.due_date, self.due_time, self.completed, self.reminder_sent_at,
+        )
+    
     @property
     def is_today(self):
+        if hasattr(self, 'bucket'):
+            return self.bucket == 'today' and self.due_date is not None
         if self.due_date:
             return self.due_date == timezone.now().date()
         return False
     
     @property
     def is_tomorrow(self):
+        if hasattr(self, 'bucket'):
+            return self.bucket == 'tomorrow'
         if self.due_date:
             tomorrow = timezone.now().date() + timedelta(days=1)
             return self.due_date == tomorrow
@@ -46,11 +328,18 @@ class Todo(models.Model):
     
     @property
     def is_upcoming(self):
+        if hasattr(self, 'bucket'):
+            return self.bucket == 'upcoming'
         if self.due_date:
             tomorrow = timezone.now().date() + timedelta(days=1)
             return self.due_date > tomorrow
         return False
     
+    @property
+    def priority_key(self):
+        """Lowercase priority name, used for CSS classes and colour lookups"""
+        return self.PRIORITY_KEYS.get(self.priority, '')
+    
     @property
     def priority_color(self):
         colors = {
@@ -58,7 +347,7 @@ class Todo(models.Model):
             'medium': '#FF9800',   # Orange  
             'high': '#F44336',     # Red
         }
-        return colors.get(self.priority, '#9E9E9E')
+        return colors.get(self.priority_key, '#9E9E9E')
     
     @property
     def category_color(self):
@@ -80,3 +369,198 @@ class Todo(models.Model):
     
     class Meta:
         ordering = ['due_date', '-created_at']
+        indexes = [
+            # home(): per-user buckets in Meta.ordering order
+            models.Index(fields=['user', 'due_date', '-created_at', '-id'], name='todo_user_due_created_idx'),
+            # home(): category lists and sidebar counts
+            models.Index(fields=['user', 'category'], name='todo_user_category_idx'),
+            # home(): completed view
+            models.Index(fields=['user', 'completed'], name='todo_user_completed_idx'),
+            # home(): overdue/missed tasks are always incomplete
+            models.Index(fields=['user', 'due_date'], condition=Q(completed=False), name='todo_user_open_due_idx'),
+            # API/conditional GET: per-user data version (max updated_at + count)
+            models.Index(fields=['user', 'updated_at'], name='todo_user_updated_idx'),
+            # TodoAdmin: default changelist ordering
+            models.Index(fields=['-created_at'], name='todo_created_desc_idx'),
+            # TodoAdmin: date hierarchy, due-today and overdue statistics
+            models.Index(fields=['due_date', 'completed'], name='todo_due_completed_idx'),
+            models.Index(fields=['priority'], name='todo_priority_idx'),
+            # home(): ?sort=priority ordering
+            models.Index(fields=['user', '-priority', 'due_date', '-created_at', '-id'], name='todo_user_priority_due_idx'),
+            # send_reminders: queue of pending reminders, small since sent ones are NULL
+            models.Index(
+                fields=['next_reminder_at'], condition=Q(next_reminder_at__isnull=False), name='todo_next_reminder_idx',
+            ),
+        ]
+
+
+class TodoCounters(models.Model):
+    """Denormalized sidebar counters, one row per user.
+
+    Rows are refreshed whenever the user's todos are saved, deleted or bulk
+    updated, and recomputed lazily when the stored day no longer matches
+    today (the date-relative buckets shift at midnight).
+    """
+    COUNTER_FIELDS = [
+        'today_count',
+        'upcoming_count',
+        'completed_count',
+        'missed_count',
+        'personal_count',
+        'work_count',
+        'home_count',
+    ]
+    
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='todo_counters')
+    as_of = models.DateField()
+    today_count = models.PositiveIntegerField(default=0)
+    upcoming_count = models.PositiveIntegerField(default=0)
+    completed_count = models.PositiveIntegerField(default=0)
+    missed_count = models.PositiveIntegerField(default=0)
+    personal_count = models.PositiveIntegerField(default=0)
+    work_count = models.PositiveIntegerField(default=0)
+    home_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Counters for user {self.user_id} ({self.as_of})"
+    
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.COUNTER_FIELDS}
+    
+    @classmethod
+    def refresh(cls, user_ids, today=None):
+        """Recompute existing counter rows for the given users.
+
+        Only rows that already exist are updated; missing rows are created on
+        the next read so that cascading user deletes never recreate them.
+        """
+        today = today or timezone.now().date()
+        for user_id in set(user_ids):
+            counts = Todo.objects.filter(user_id=user_id).sidebar_counts(today)
+            cls.objects.filter(user_id=user_id).update(as_of=today, updated_at=timezone.now(), **counts)
+    
+    @classmethod
+    def for_user(cls, user, today=None):
+        """Return the sidebar counts for a user, rebuilding a stale or missing row"""
+        today = today or timezone.now().date()
+        counters = cls.objects.filter(user=user).first()
+        if counters is not None and counters.as_of == today:
+            return counters.as_dict()
+        counts = Todo.objects.filter(user=user).sidebar_counts(today)
+        # One upsert rather than update_or_create()'s locking SELECT and savepoint
+        cls.objects.bulk_create(
+            [cls(user=user, as_of=today, **counts)],
+            update_conflicts=True, unique_fields=['user'], update_fields=['as_of', 'updated_at', *cls.COUNTER_FIELDS],
+        )
+        return counts
+    
+    @classmethod
+    async def afor_user(cls, user, today=None):
+        return await sync_to_async(cls.for_user)(user, today)
+    
+    class Meta:
+        verbose_name_plural = 'todo counters'
+
+
+class TodoChange(models.Model):
+    """Append-only log of todo writes, read by the delta sync API.
+
+    receivers.py adds one row per changed todo for every committed
+    transaction. Deleted todos leave a tombstone row, including todos removed
+    by CASCADE when their user is deleted, which is why ``user`` has no
+    database constraint. Bulk updates too large to log per todo leave one
+    ``reset`` row per user instead. The auto-incrementing id is the sync cursor.
+    """
+    user = models.ForeignKey(
+        User, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name='+'
+    )
+    todo_id = models.BigIntegerField()
+    deleted = models.BooleanField(default=False)
+    # Any number of the user's todos changed; their clients refetch everything
+    reset = models.BooleanField(default=False)
+    changed_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        if self.reset:
+            return f"Reset todos of user {self.user_id} (#{self.id})"
+        return f"{'Deleted' if self.deleted else 'Changed'} todo {self.todo_id} (#{self.id})"
+    
+    @classmethod
+    def record(cls, changed, deleted, reset=()):
+        """Log writes; ``changed`` and ``deleted`` map todo ids to their user id,
+        ``reset`` holds the users whose todos changed too widely to list"""
+        cls.objects.bulk_create(
+            [cls(user_id=user_id, todo_id=pk) for pk, user_id in changed.items()]
+            + [cls(user_id=user_id, todo_id=pk, deleted=True) for pk, user_id in deleted.items()]
+            + [cls(user_id=user_id, todo_id=0, reset=True) for user_id in reset]
+        )
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'id'], name='todochange_user_id_idx'),
+        ]
+
+
+class TodoDueDateCount(models.Model):
+    """Number of todos due on each date, which drives the TodoAdmin date hierarchy.
+
+    receivers.py applies the changes of every committed transaction, so the
+    admin can list years, months and days with their counts from this small
+    table instead of scanning myapp_todo. The rebuild_due_date_counts
+    command corrects any counts that have drifted.
+    """
+    due_date = models.DateField(primary_key=True)
+    count = models.IntegerField(default=0)
+    
+    def __str__(self):
+        return f"{self.count} todos due {self.due_date}"
+    
+    @classmethod
+    def apply(cls, deltas):
+        """Add ``{due_date: delta}`` to the counts, creating missing rows"""
+        deltas = {due_date: delta for due_date, delta in deltas.items() if due_date is not None and delta}
+        if not deltas:
+            return
+        # Nearly every date already has a row, so look before inserting
+        # rather than paying for an INSERT (and its transaction) every time
+        existing = set(cls.objects.filter(due_date__in=deltas).values_list('due_date', flat=True))
+        missing = [due_date for due_date in deltas if due_date not in existing]
+        if missing:
+            cls.objects.bulk_create([cls(due_date=due_date) for due_date in missing], ignore_conflicts=True)
+        cls.objects.filter(due_date__in=deltas).update(count=F('count') + Case(
+            *[When(due_date=due_date, then=Value(delta)) for due_date, delta in deltas.items()],
+            output_field=models.IntegerField(),
+        ))
+    
+    @classmethod
+    def reconcile(cls, batch_size=1000):
+        """Correct every count that differs from the todos; returns the number of dates fixed.
+
+        The counts are kept by adding deltas, so nothing else would ever
+        repair one that went wrong: a write made with raw SQL, say, or a
+        save() or delete() of an instance loaded before a bulk update moved
+        its due date. The
+        rebuild_due_date_counts command runs this and is meant to be
+        scheduled, e.g. nightly.
+        """
+        rows = Todo.objects.order_by().exclude(due_date=None).values_list('due_date').annotate(count=Count('id'))
+        actual = dict(rows)
+        with transaction.atomic():
+            stored = dict(cls.objects.select_for_update().values_list('due_date', 'count'))
+            wrong = {
+                due_date: actual.get(due_date, 0)
+                for due_date in actual.keys() | stored.keys()
+                if actual.get(due_date, 0) != stored.get(due_date, 0)
+            }
+            cls.objects.bulk_create(
+                [cls(due_date=due_date) for due_date in wrong if due_date not in stored], batch_size=batch_size,
+            )
+            cls.objects.bulk_update(
+                [cls(due_date=due_date, count=count) for due_date, count in wrong.items()], ['count'],
+                batch_size=batch_size,
+            )
+        return len(wrong)
+    
+    class Meta:
+        verbose_name = 'todo due date count'
@@ -0,0 +1,148 @@
+"""Keyset (cursor) pagination for Todo lists.
+
+Pages are ordered by a list of field names such as
+``['due_date', '-created_at', '-id']`` which must end in a unique field.
+Nullable fields sort NULLS LAST in both directions so that SQLite and
+PostgreSQL agree on the order and the composite indexes can be used.
+
+EstimatedCountPaginator serves the admin changelist, which still pages by
+offset but need not count a huge table exactly.
+"""
+import base64
+import json
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import F, Q
+from django.utils.functional import cached_property
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _split(name):
+    if name.startswith('-'):
+        return name[1:], True
+    return name, False
+
+
+def order_by_expressions(model, ordering):
+    expressions = []
+    for name in ordering:
+        field_name, descending = _split(name)
+        if model._meta.get_field(field_name).null:
+            expression = F(field_name).desc(nulls_last=True) if descending else F(field_name).asc(nulls_last=True)
+            expressions.append(expression)
+        else:
+            expressions.append(name)
+    return expressions
+
+
+def encode_cursor(obj, ordering):
+    values = []
+    for name in ordering:
+        value = getattr(obj, _split(name)[0])
+        values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+def decode_cursor(model, ordering, cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor('Malformed cursor.') from e
+    if not isinstance(values, list) or len(values) != len(ordering):
+        raise InvalidCursor('Cursor does not match the requested ordering.')
+    try:
+        return [
+            None if value is None else model._meta.get_field(_split(name)[0]).to_python(value)
+            for name, value in zip(ordering, values)
+        ]
+    except Exception as e:
+        raise InvalidCursor('Malformed cursor.') from e
+
+
+def keyset_filter(model, ordering, values):
+    """Q object matching every row that sorts strictly after ``values``"""
+    clauses = []
+    for index, name in enumerate(ordering):
+        field_name, descending = _split(name)
+        value = values[index]
+        if value is None:
+            # NULLS LAST: nothing sorts after a NULL in this column
+            continue
+        after = Q(**{f"{field_name}__{'lt' if descending else 'gt'}": value})
+        if model._meta.get_field(field_name).null:
+            after |= Q(**{f'{field_name}__isnull': True})
+        for previous_name, previous_value in zip(ordering[:index], values[:index]):
+            previous_field = _split(previous_name)[0]
+            if previous_value is None:
+                after &= Q(**{f'{previous_field}__isnull': True})
+            else:
+                after &= Q(**{previous_field: previous_value})
+        clauses.append(after)
+    return reduce(or_, clauses) if clauses else None
+
+
+def keyset_queryset(queryset, ordering, cursor=None, page_size=50):
+    """The ordered query for the page after ``cursor``, fetching one extra row to detect a next page"""
+    model = queryset.model
+    queryset = queryset.order_by(*order_by_expressions(model, ordering))
+    if cursor:
+        condition = keyset_filter(model, ordering, decode_cursor(model, ordering, cursor))
+        if condition is None:
+            return queryset.none()
+        queryset = queryset.filter(condition)
+    return queryset[:page_size + 1]
+
+
+def split_page(items, ordering, page_size):
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        next_cursor = encode_cursor(items[-1], ordering)
+    return items, next_cursor
+
+
+def keyset_page(queryset, ordering, cursor=None, page_size=50):
+    """Return ``(items, next_cursor)`` for the page that starts after ``cursor``"""
+    items = list(keyset_queryset(queryset, ordering, cursor, page_size))
+    return split_page(items, ordering, page_size)
+
+
+async def akeyset_page(queryset, ordering, cursor=None, page_size=50):
+    """Async version of keyset_page()"""
+    items = [item async for item in keyset_queryset(queryset, ordering, cursor, page_size)]
+    return split_page(items, ordering, page_size)
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that trusts PostgreSQL's row estimate for unfiltered big tables.
+
+    An exact COUNT(*) has to visit every row. When the list is not filtered
+    and the planner estimates more than ``TODO_ADMIN_ESTIMATED_COUNT_THRESHOLD``
+    rows, the estimate from pg_class is used instead, which is kept current
+    by autovacuum's ANALYZE. Smaller tables, filtered lists and other
+    databases are counted exactly.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                    [connection.ops.quote_name(queryset.model._meta.db_table)],
+                )
+                row = cursor.fetchone()
+            # reltuples is -1 for a table that has never been analyzed
+            if row and row[0] > settings.TODO_ADMIN_ESTIMATED_COUNT_THRESHOLD:
+                return row[0]
+        return super().count
@@ -0,0 +1,74 @@
+"""Bounded on-disk store for request profiles captured by ProfilingMiddleware.
+
+Each profile is a cProfile stats file (open it with ``python -m pstats`` or
+snakeviz) plus a JSON file describing the request. Names start with the
+capture time, and only the newest ``TODO_PROFILE_MAX_FILES`` profiles are kept.
+"""
+import json
+import re
+import time
+import uuid
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+
+NAME_RE = re.compile(r'^\d+-[0-9a-f]{8}$')
+
+
+class ProfileStore:
+    def __init__(self, directory, max_files):
+        self.directory = Path(directory)
+        self.max_files = max_files
+
+    def save(self, profiler, meta):
+        """Write a profile and its request details; returns the profile's name"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        name = f'{time.time_ns()}-{uuid.uuid4().hex[:8]}'
+        profiler.dump_stats(self.directory / f'{name}.prof')
+        (self.directory / f'{name}.json').write_text(json.dumps({**meta, 'name': name}))
+        self.rotate()
+        return name
+
+    def names(self):
+        """Profile names, oldest first"""
+        return sorted(path.stem for path in self.directory.glob('*.json') if NAME_RE.match(path.stem))
+
+    def rotate(self):
+        names = self.names()
+        for name in names[:max(len(names) - self.max_files, 0)]:
+            for suffix in ('.prof', '.json'):
+                (self.directory / f'{name}{suffix}').unlink(missing_ok=True)
+
+    def profiles(self):
+        if not self.directory.is_dir():
+            return []
+        profiles = []
+        for name in self.names():
+            try:
+                profiles.append(json.loads((self.directory / f'{name}.json').read_text()))
+            except (OSError, ValueError):
+                # Rotated away by another process, or half written
+                continue
+        return profiles
+
+    def slowest_by_view(self, per_view=10):
+        """``[(view_name, profiles)]``, slowest first within and across views"""
+        by_view = defaultdict(list)
+        for profile in self.profiles():
+            by_view[profile['view'] or '(unresolved)'].append(profile)
+        groups = [
+            (view, sorted(profiles, key=lambda profile: profile['duration_ms'], reverse=True)[:per_view])
+            for view, profiles in by_view.items()
+        ]
+        return sorted(groups, key=lambda group: group[1][0]['duration_ms'], reverse=True)
+
+    def stats_path(self, name):
+        if not NAME_RE.match(name):
+            return None
+        path = self.directory / f'{name}.prof'
+        return path if path.is_file() else None
+
+
+def get_profile_store():
+    return ProfileStore(settings.TODO_PROFILE_DIR, settings.TODO_PROFILE_MAX_FILES)
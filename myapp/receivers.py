@@ -0,0 +1,130 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .caching import bump_todo_versions
+from .events import publish_changes
+from .models import Todo, TodoChange, TodoCounters, TodoDueDateCount
+from .signals import todos_bulk_created, todos_bulk_updated
+from .suggestions import suggestion_cache
+
+
+class PendingRefresh:
+    """Todo writes of one transaction, applied by flush_user_refresh() once it commits.
+
+    The object is itself the on_commit callback, so when the transaction (or
+    the savepoint it was registered in) rolls back, Django drops it and the
+    writes it gathered with it.
+    """
+    def __init__(self):
+        self.user_ids = set()
+        # Written todos for the change log and live-update feed, as id -> user id
+        self.created = {}
+        self.updated = {}
+        self.deleted = {}
+        # Users with more updated todos than are worth listing
+        self.reset = set()
+        # Change in the number of todos due per date, for TodoDueDateCount
+        self.due_dates = {}
+        self.flushed = False
+    
+    def __call__(self):
+        self.flushed = True
+        flush_user_refresh(self)
+
+
+def get_pending():
+    """The PendingRefresh already waiting on the current transaction, if any"""
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        return None
+    # Reuse the callback registered at this savepoint level, so a transaction
+    # is refreshed once however many todos it writes. run_on_commit entries are
+    # Django's private (savepoint ids, callback, robust) tuples; PendingRefreshTests
+    # fails if that shape changes
+    savepoint_ids = set(connection.savepoint_ids)
+    for sids, func, _ in reversed(connection.run_on_commit):
+        if isinstance(func, PendingRefresh) and sids == savepoint_ids and not func.flushed:
+            return func
+    return None
+
+
+def schedule_user_refresh(user_ids, created=None, updated=None, deleted=None, due_dates=None, reset=False):
+    """Refresh each user's derived data once, when the current transaction commits.
+
+    ``created``, ``updated`` and ``deleted`` map todo ids to their user id,
+    and ``due_dates`` maps dates to the change in todos due then. With
+    ``reset``, any of the users' todos may have changed.
+    """
+    pending = get_pending()
+    registered = pending is not None
+    pending = pending or PendingRefresh()
+    pending.user_ids.update(user_ids)
+    pending.created.update(created or {})
+    pending.updated.update(updated or {})
+    pending.deleted.update(deleted or {})
+    if reset:
+        pending.reset.update(user_ids)
+    for due_date, delta in (due_dates or {}).items():
+        pending.due_dates[due_date] = pending.due_dates.get(due_date, 0) + delta
+    if not registered:
+        # Outside a transaction this runs at once
+        transaction.on_commit(pending)
+
+
+def flush_user_refresh(pending):
+    if not pending.user_ids:
+        return
+    deleted = pending.deleted
+    created = {pk: user_id for pk, user_id in pending.created.items() if pk not in deleted}
+    updated = {pk: user_id for pk, user_id in pending.updated.items() if pk not in deleted and pk not in created}
+    user_ids = pending.user_ids
+    # One transaction for every write, instead of one per insert
+    with transaction.atomic():
+        TodoChange.record({**created, **updated}, deleted, pending.reset)
+        TodoDueDateCount.apply(pending.due_dates)
+        if settings.TODO_COUNTER_TABLE:
+            TodoCounters.refresh(user_ids)
+    bump_todo_versions(user_ids)
+    for user_id in user_ids:
+        suggestion_cache.invalidate(user_id)
+    if settings.TODO_LIVE_UPDATES:
+        publish_changes(created.keys(), updated.keys(), deleted, pending.reset)
+
+
+@receiver(post_save, sender=Todo)
+def refresh_on_save(sender, instance, created, **kwargs):
+    due_dates = {}
+    # An instance that was loaded without its due_date cannot have changed it
+    if 'due_date' not in instance.get_deferred_fields():
+        previous = None if created else getattr(instance, '_loaded_due_date', instance.due_date)
+        if previous != instance.due_date:
+            due_dates = {previous: -1, instance.due_date: 1}
+        instance._loaded_due_date = instance.due_date
+    written = {instance.pk: instance.user_id}
+    if created:
+        schedule_user_refresh([instance.user_id], created=written, due_dates=due_dates)
+    else:
+        schedule_user_refresh([instance.user_id], updated=written, due_dates=due_dates)
+
+
+@receiver(post_delete, sender=Todo)
+def refresh_on_delete(sender, instance, **kwargs):
+    schedule_user_refresh(
+        [instance.user_id], deleted={instance.pk: instance.user_id}, due_dates={instance.due_date: -1},
+    )
+
+
+@receiver(todos_bulk_updated, sender=Todo)
+def refresh_on_bulk_update(sender, owners, user_ids, due_date_changes=None, **kwargs):
+    schedule_user_refresh(user_ids, updated=owners, due_dates=due_date_changes, reset=owners is None)
+
+
+@receiver(todos_bulk_created, sender=Todo)
+def refresh_on_bulk_create(sender, todos, **kwargs):
+    due_dates = {}
+    for todo in todos:
+        due_dates[todo.due_date] = due_dates.get(todo.due_date, 0) + 1
+    schedule_user_refresh(
+        {todo.user_id for todo in todos}, created={todo.pk: todo.user_id for todo in todos}, due_dates=due_dates,
+    )
@@ -0,0 +1,82 @@
+"""Email reminders for todos that are about to fall due.
+
+Todo.save() keeps ``next_reminder_at`` up to date and the send_reminders
+command calls send_due_reminders() in a loop. Each batch is claimed before
+it is sent, so several workers can run side by side without sending the
+same reminder twice: PostgreSQL (and other databases with SKIP LOCKED) lock
+the batch's rows, and SQLite marks the whole batch as taken with one UPDATE.
+"""
+import logging
+import random
+from datetime import timedelta
+
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection, transaction
+from django.utils import formats, timezone
+from .models import Todo, get_next_reminder_at
+
+logger = logging.getLogger(__name__)
+
+# How long a reminder whose email failed waits before it is tried again
+RETRY_DELAY = timedelta(minutes=5)
+
+# How long a worker without row locks owns a claimed batch before other
+# workers may pick it up again
+CLAIM_LEASE = timedelta(minutes=10)
+
+
+def build_reminder(todo, mail_connection):
+    when = formats.date_format(todo.due_date, 'DATE_FORMAT')
+    if todo.due_time:
+        when = f"{when} at {todo.due_time.strftime('%H:%M')}"
+    return EmailMessage(
+        subject=f'Reminder: {todo.text}',
+        body=f'Hi {todo.user.get_short_name() or todo.user.get_username()},\n\n'
+             f'Your task "{todo.text}" is due {when}.\n',
+        to=[todo.user.email],
+        connection=mail_connection,
+    )
+
+
+def deliver(todos, claimed, now):
+    """Email the owner of each todo in ``claimed``; returns the number of emails sent"""
+    reminded, failed = [], []
+    mail_connection = get_connection()
+    for todo in todos:
+        next_reminder_at = get_next_reminder_at(todo.due_date, todo.due_time, todo.completed, todo.reminder_sent_at, now)
+        if next_reminder_at is None or next_reminder_at > now:
+            # Completed or moved by a bulk update since it was queued
+            claimed.filter(pk=todo.pk).set_reminder(next_reminder_at=next_reminder_at)
+            continue
+        if todo.user.email:
+            try:
+                build_reminder(todo, mail_connection).send()
+            except Exception:
+                logger.exception('Could not send the reminder for todo %s', todo.pk)
+                failed.append(todo.pk)
+                continue
+        reminded.append(todo)
+    if reminded:
+        claimed.filter(pk__in=[todo.pk for todo in reminded]).set_reminder(next_reminder_at=None, reminder_sent_at=now)
+    if failed:
+        claimed.filter(pk__in=failed).set_reminder(next_reminder_at=now + RETRY_DELAY)
+    return sum(1 for todo in reminded if todo.user.email)
+
+
+def send_due_reminders(batch_size, now=None):
+    """Claim and send one batch of due reminders; returns (claimed, sent)"""
+    now = now or timezone.now()
+    due = Todo.objects.due_reminders(now)
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            todos = list(due.select_related('user').select_for_update(skip_locked=True, of=('self',))[:batch_size])
+            return len(todos), deliver(todos, Todo.objects.all(), now)
+
+    # Without row locks, claim the batch with one UPDATE that moves its
+    # reminders to a time of this worker's own at the end of the lease, so a
+    # batch left behind by a crashed worker becomes due again after that.
+    marker = now + CLAIM_LEASE + timedelta(microseconds=random.getrandbits(32))
+    Todo.objects.filter(pk__in=due.values('pk')[:batch_size]).set_reminder(next_reminder_at=marker)
+    claimed = Todo.objects.filter(next_reminder_at=marker)
+    todos = list(claimed.select_related('user'))
+    return len(todos), deliver(todos, claimed, now)
@@ -0,0 +1,198 @@
+"""Pluggable full-text search over Todo.text.
+
+The backend is picked from the database vendor:
+
+* SQLite uses an FTS5 external-content table kept in sync by triggers.
+* PostgreSQL uses a generated ``tsvector`` column with a GIN index.
+* Anything else, or ``TODO_SEARCH_BACKEND = 'like'``, falls back to
+  ``text__icontains``.
+
+Every word of the query is matched as a prefix, so "gro mil" finds
+"Buy groceries and milk".
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import BooleanField, Case, FloatField, Value, When
+from django.db.models.expressions import RawSQL
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def query_words(query):
+    return WORD_RE.findall(query.lower())
+
+
+class LikeSearchBackend:
+    name = 'like'
+
+    def install(self, connection):
+        pass
+
+    def rebuild(self, connection):
+        pass
+
+    def filter(self, queryset, query):
+        return queryset.filter(text__icontains=query)
+
+    def matches(self, text, query):
+        """Python equivalent of filter() for a single text"""
+        return query.lower() in text.lower()
+
+    def ranked(self, queryset, query):
+        """Matches ordered best first, with the score in ``search_rank``"""
+        return self.filter(queryset, query).annotate(search_rank=Case(
+            When(text__istartswith=query, then=Value(1.0)),
+            default=Value(0.0),
+            output_field=FloatField(),
+        )).order_by('-search_rank', 'text')
+
+
+class FullTextSearchBackend(LikeSearchBackend):
+    """Base for backends that match every query word as a word prefix"""
+
+    def matches(self, text, query):
+        text_words = query_words(text)
+        return all(any(word.startswith(prefix) for word in text_words) for prefix in query_words(query))
+
+
+class SQLiteSearchBackend(FullTextSearchBackend):
+    name = 'sqlite-fts5'
+
+    # The index table and the triggers that keep it in sync
+    SCHEMA_OBJECTS = ('myapp_todo_fts', 'myapp_todo_fts_ai', 'myapp_todo_fts_ad', 'myapp_todo_fts_au')
+
+    INSTALL_SQL = [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS myapp_todo_fts USING fts5("
+        "text, content='myapp_todo', content_rowid='id', tokenize='unicode61', prefix='2 3')",
+        "CREATE TRIGGER IF NOT EXISTS myapp_todo_fts_ai AFTER INSERT ON myapp_todo BEGIN "
+        "INSERT INTO myapp_todo_fts(rowid, text) VALUES (new.id, new.text); END",
+        "CREATE TRIGGER IF NOT EXISTS myapp_todo_fts_ad AFTER DELETE ON myapp_todo BEGIN "
+        "INSERT INTO myapp_todo_fts(myapp_todo_fts, rowid, text) VALUES ('delete', old.id, old.text); END",
+        "CREATE TRIGGER IF NOT EXISTS myapp_todo_fts_au AFTER UPDATE OF text ON myapp_todo BEGIN "
+        "INSERT INTO myapp_todo_fts(myapp_todo_fts, rowid, text) VALUES ('delete', old.id, old.text); "
+        "INSERT INTO myapp_todo_fts(rowid, text) VALUES (new.id, new.text); END",
+    ]
+
+    def install(self, connection):
+        self.rebuild(connection)
+
+    def rebuild(self, connection):
+        # Table remakes done by SQLite migrations drop triggers, so recreate them too
+        with connection.cursor() as cursor:
+            for statement in self.INSTALL_SQL:
+                cursor.execute(statement)
+            cursor.execute("INSERT INTO myapp_todo_fts(myapp_todo_fts) VALUES ('rebuild')")
+
+    def match_expression(self, query):
+        return ' '.join(f'"{word}"*' for word in query_words(query))
+
+    def filter(self, queryset, query):
+        match = self.match_expression(query)
+        if not match:
+            return super().filter(queryset, query)
+        return queryset.filter(id__in=RawSQL(
+            "SELECT rowid FROM myapp_todo_fts WHERE myapp_todo_fts MATCH %s", [match]
+        ))
+
+    def ranked(self, queryset, query):
+        match = self.match_expression(query)
+        if not match:
+            return super().ranked(queryset, query)
+        # bm25() is lower for better matches, so negate it
+        rank = RawSQL(
+            "SELECT -bm25(myapp_todo_fts) FROM myapp_todo_fts "
+            "WHERE myapp_todo_fts MATCH %s AND rowid = myapp_todo.id", [match],
+            output_field=FloatField(),
+        )
+        return self.filter(queryset, query).annotate(search_rank=rank).order_by('-search_rank', 'text')
+
+
+class PostgresSearchBackend(FullTextSearchBackend):
+    name = 'postgres-tsvector'
+
+    INSTALL_SQL = [
+        "ALTER TABLE myapp_todo ADD COLUMN IF NOT EXISTS search_vector tsvector "
+        "GENERATED ALWAYS AS (to_tsvector('simple', coalesce(text, ''))) STORED",
+        "CREATE INDEX IF NOT EXISTS todo_search_vector_idx ON myapp_todo USING GIN (search_vector)",
+    ]
+
+    def install(self, connection):
+        with connection.cursor() as cursor:
+            for statement in self.INSTALL_SQL:
+                cursor.execute(statement)
+
+    def rebuild(self, connection):
+        # The generated column can never go stale; only the index is rebuilt
+        self.install(connection)
+        with connection.cursor() as cursor:
+            cursor.execute("REINDEX INDEX todo_search_vector_idx")
+
+    def tsquery(self, query):
+        return ' & '.join(f'{word}:*' for word in query_words(query))
+
+    def filter(self, queryset, query):
+        tsquery = self.tsquery(query)
+        if not tsquery:
+            return super().filter(queryset, query)
+        matches = RawSQL(
+            "myapp_todo.search_vector @@ to_tsquery('simple', %s)", [tsquery],
+            output_field=BooleanField(),
+        )
+        return queryset.annotate(search_match=matches).filter(search_match=True)
+
+    def ranked(self, queryset, query):
+        tsquery = self.tsquery(query)
+        if not tsquery:
+            return super().ranked(queryset, query)
+        rank = RawSQL(
+            "ts_rank(myapp_todo.search_vector, to_tsquery('simple', %s))", [tsquery],
+            output_field=FloatField(),
+        )
+        return self.filter(queryset, query).annotate(search_rank=rank).order_by('-search_rank', 'text')
+
+
+BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+_installed = {}
+
+
+def is_installed(backend, connection):
+    """Check once per database that the backend's index, and any triggers it needs, exist"""
+    key = (backend.name, connection.settings_dict['NAME'])
+    if key not in _installed:
+        with connection.cursor() as cursor:
+            if backend.name == 'sqlite-fts5':
+                # Without the triggers the index goes stale, so LIKE is used until it is rebuilt
+                objects = backend.SCHEMA_OBJECTS
+                cursor.execute(
+                    f"SELECT COUNT(*) FROM sqlite_master WHERE name IN ({', '.join(['%s'] * len(objects))})", objects
+                )
+                _installed[key] = cursor.fetchone()[0] == len(objects)
+            else:
+                cursor.execute(
+                    "SELECT 1 FROM information_schema.columns "
+                    "WHERE table_name = 'myapp_todo' AND column_name = 'search_vector'"
+                )
+                _installed[key] = cursor.fetchone() is not None
+    return _installed[key]
+
+
+def get_search_backend(connection=connection):
+    """Return the search backend for the database, falling back to LIKE"""
+    backend_class = BACKENDS.get(connection.vendor, LikeSearchBackend)
+    if getattr(settings, 'TODO_SEARCH_BACKEND', 'auto') == 'like':
+        backend_class = LikeSearchBackend
+    backend = backend_class()
+    if backend_class is not LikeSearchBackend and not is_installed(backend, connection):
+        return LikeSearchBackend()
+    return backend
+
+
+def search_todos(queryset, query):
+    """Restrict a Todo queryset to rows matching the search query"""
+    return get_search_backend().filter(queryset, query)
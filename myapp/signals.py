@@ -0,0 +1,12 @@
+from django.dispatch import Signal
+
+# Sent by TodoQuerySet.update() after a queryset-level update, which bypasses
+# the per-instance post_save signal. Receivers get ``user_ids`` and
+# ``owners``, a dict mapping each updated pk to its user id, or None when the
+# update was too large to list every todo. Updates of due_date also send
+# ``due_date_changes``, the change in the number of todos due per date.
+todos_bulk_updated = Signal()
+
+# Sent by TodoQuerySet.bulk_create(), which bypasses post_save too. Receivers
+# get ``todos``, the inserted instances with their primary keys set.
+todos_bulk_created = Signal()
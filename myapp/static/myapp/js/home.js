@@ -0,0 +1,407 @@
+function toggleAddForm() {
+    const form = document.getElementById('addTaskForm');
+    const button = document.querySelector('.add-task-btn');
+    const isActive = form.classList.contains('active');
+
+    form.classList.toggle('active');
+    button.setAttribute('aria-expanded', !isActive);
+
+    if (form.classList.contains('active')) {
+        const firstInput = form.querySelector('input[type="text"]');
+        firstInput.focus();
+    } else {
+        button.focus();
+    }
+}
+
+// Profile dropdown functionality
+function toggleProfileDropdown() {
+    const userInfo = document.querySelector('.user-info');
+    const dropdown = document.getElementById('profileDropdown');
+    const isExpanded = userInfo.getAttribute('aria-expanded') === 'true';
+
+    userInfo.classList.toggle('active');
+    dropdown.classList.toggle('show');
+    userInfo.setAttribute('aria-expanded', !isExpanded);
+
+    if (!isExpanded) {
+        // Focus first menu item when opening
+        const firstMenuItem = dropdown.querySelector('.dropdown-item');
+        if (firstMenuItem) {
+            firstMenuItem.focus();
+        }
+    }
+}
+
+// Handle keyboard navigation for profile dropdown
+function handleProfileKeydown(event) {
+    if (event.key === 'Enter' || event.key === ' ') {
+        event.preventDefault();
+        toggleProfileDropdown();
+    } else if (event.key === 'Escape') {
+        const userInfo = document.querySelector('.user-info');
+        const dropdown = document.getElementById('profileDropdown');
+        userInfo.classList.remove('active');
+        dropdown.classList.remove('show');
+        userInfo.setAttribute('aria-expanded', 'false');
+        userInfo.focus();
+    }
+}
+
+// Close dropdown when clicking outside or on escape
+document.addEventListener('click', function(event) {
+    const userInfo = document.querySelector('.user-info');
+    const dropdown = document.getElementById('profileDropdown');
+
+    if (!userInfo.contains(event.target)) {
+        userInfo.classList.remove('active');
+        dropdown.classList.remove('show');
+        userInfo.setAttribute('aria-expanded', 'false');
+    }
+});
+
+// Handle escape key globally
+document.addEventListener('keydown', function(event) {
+    if (event.key === 'Escape') {
+        // Close any open dropdowns or forms
+        const dropdown = document.getElementById('profileDropdown');
+        const userInfo = document.querySelector('.user-info');
+        const form = document.getElementById('addTaskForm');
+        const addButton = document.querySelector('.add-task-btn');
+
+        if (dropdown.classList.contains('show')) {
+            userInfo.classList.remove('active');
+            dropdown.classList.remove('show');
+            userInfo.setAttribute('aria-expanded', 'false');
+            userInfo.focus();
+        } else if (form.classList.contains('active')) {
+            form.classList.remove('active');
+            addButton.setAttribute('aria-expanded', 'false');
+            addButton.focus();
+        }
+    }
+});
+
+// Theme toggle functionality
+function toggleTheme() {
+    const body = document.body;
+    const themeIcon = document.getElementById('theme-icon');
+    const themeText = document.getElementById('theme-text');
+    const themeButton = document.querySelector('.theme-toggle');
+
+    // Toggle theme
+    if (body.getAttribute('data-theme') === 'dark') {
+        body.removeAttribute('data-theme');
+        themeIcon.textContent = '🌙';
+        themeText.textContent = 'Dark';
+        themeButton.setAttribute('aria-pressed', 'false');
+        themeButton.setAttribute('aria-label', 'Enable dark mode');
+        localStorage.setItem('theme', 'light');
+    } else {
+        body.setAttribute('data-theme', 'dark');
+        themeIcon.textContent = '☀️';
+        themeText.textContent = 'Light';
+        themeButton.setAttribute('aria-pressed', 'true');
+        themeButton.setAttribute('aria-label', 'Disable dark mode');
+        localStorage.setItem('theme', 'dark');
+    }
+}
+
+// Load saved theme on page load
+document.addEventListener('DOMContentLoaded', function() {
+    const savedTheme = localStorage.getItem('theme');
+    const body = document.body;
+    const themeIcon = document.getElementById('theme-icon');
+    const themeText = document.getElementById('theme-text');
+    const themeButton = document.querySelector('.theme-toggle');
+
+    if (savedTheme === 'dark') {
+        body.setAttribute('data-theme', 'dark');
+        themeIcon.textContent = '☀️';
+        themeText.textContent = 'Light';
+        themeButton.setAttribute('aria-pressed', 'true');
+        themeButton.setAttribute('aria-label', 'Disable dark mode');
+    }
+});
+
+// Toast notification system
+function createToast(message, type = 'info', duration = 4000) {
+    const toastContainer = document.getElementById('toastContainer');
+    const toastId = 'toast-' + Date.now();
+
+    const toast = document.createElement('div');
+    toast.className = `toast ${type}`;
+    toast.id = toastId;
+    toast.innerHTML = `
+        <div class="toast-icon"></div>
+        <div class="toast-content">
+            <p class="toast-message">${message}</p>
+        </div>
+        <button class="toast-close" onclick="removeToast('${toastId}')">&times;</button>
+    `;
+
+    toastContainer.appendChild(toast);
+
+    // Trigger show animation
+    setTimeout(() => {
+        toast.classList.add('show');
+    }, 100);
+
+    // Auto remove after duration
+    setTimeout(() => {
+        removeToast(toastId);
+    }, duration);
+}
+
+function removeToast(toastId) {
+    const toast = document.getElementById(toastId);
+    if (toast) {
+        toast.classList.remove('show');
+        setTimeout(() => {
+            if (toast.parentNode) {
+                toast.parentNode.removeChild(toast);
+            }
+        }, 300);
+    }
+}
+
+// Show Django messages as toasts
+function showDjangoMessages() {
+    document.querySelectorAll('#django-messages li').forEach(item => {
+        const tags = item.dataset.tags || 'info';
+        createToast(item.textContent, tags, tags === 'error' ? 6000 : 4000);
+    });
+}
+
+// Add form-control class to all form fields
+document.addEventListener('DOMContentLoaded', function() {
+    const inputs = document.querySelectorAll('input, select, textarea');
+    inputs.forEach(input => {
+        input.classList.add('form-control');
+
+        // Add placeholder for task input
+        if (input.name === 'text') {
+            input.placeholder = 'I want to...';
+            input.classList.add('task-input');
+        }
+    });
+
+    // Show Django messages as toasts on page load
+    showDjangoMessages();
+
+    // Load further pages of tasks as their "Show more" link scrolls into view
+    document.querySelectorAll('.load-more').forEach(link => {
+        link.addEventListener('click', event => {
+            event.preventDefault();
+            loadMoreTasks(link);
+        });
+        if ('IntersectionObserver' in window) {
+            const observer = new IntersectionObserver(entries => {
+                if (entries.some(entry => entry.isIntersecting)) {
+                    loadMoreTasks(link);
+                }
+            });
+            observer.observe(link);
+            link.observer = observer;
+        }
+    });
+});
+
+// Search-as-you-type suggestions, debounced to one request per pause in typing
+function setupSearchSuggestions() {
+    const input = document.getElementById('search-input');
+    const list = document.getElementById('search-suggestions');
+    let timer = null;
+    let controller = null;
+
+    input.addEventListener('input', () => {
+        clearTimeout(timer);
+        const query = input.value.trim();
+        if (!query) {
+            list.innerHTML = '';
+            return;
+        }
+        timer = setTimeout(() => {
+            if (controller) {
+                controller.abort();
+            }
+            controller = new AbortController();
+            const url = `${input.dataset.suggestUrl}?q=${encodeURIComponent(query)}`;
+            fetch(url, {signal: controller.signal, credentials: 'same-origin'})
+                .then(response => response.ok ? response.json() : {suggestions: []})
+                .then(data => {
+                    list.innerHTML = '';
+                    data.suggestions.forEach(suggestion => {
+                        const option = document.createElement('option');
+                        option.value = suggestion.text;
+                        list.appendChild(option);
+                    });
+                })
+                .catch(() => {});
+        }, 200);
+    });
+}
+
+document.addEventListener('DOMContentLoaded', setupSearchSuggestions);
+
+// Send a task form with fetch(); returns the parsed JSON response
+function submitTaskForm(form) {
+    return fetch(form.action, {
+        method: 'POST',
+        body: new FormData(form),
+        headers: {'X-Requested-With': 'XMLHttpRequest'},
+        credentials: 'same-origin'
+    }).then(response => {
+        if (!response.ok) {
+            throw new Error('Request failed');
+        }
+        return response.json();
+    });
+}
+
+// Refresh the sidebar counters from a JSON response
+function updateSidebarCounts(counts) {
+    Object.entries(counts || {}).forEach(([key, value]) => {
+        const badge = document.querySelector(`[data-count-key="${key}"]`);
+        if (badge) {
+            badge.textContent = value;
+            badge.setAttribute('aria-label', badge.getAttribute('aria-label').replace(/^\d+/, value));
+        }
+    });
+}
+
+// Toggle a task in place; falls back to a normal form post on error
+function toggleTask(checkbox) {
+    const form = checkbox.form;
+    submitTaskForm(form)
+        .then(data => {
+            const item = checkbox.closest('.task-item');
+            item.classList.toggle('completed', data.completed);
+            checkbox.checked = data.completed;
+            updateSidebarCounts(data.counts);
+            createToast(data.completed ? 'Task completed!' : 'Task marked as pending!', 'success');
+        })
+        .catch(() => form.submit());
+}
+
+// Delete a task in place; returns false to cancel the normal form post
+function deleteTask(form) {
+    if (!confirm('Are you sure you want to delete this task?')) {
+        return false;
+    }
+    submitTaskForm(form)
+        .then(data => {
+            form.closest('.task-item').remove();
+            updateSidebarCounts(data.counts);
+            createToast('Task deleted successfully!', 'success');
+        })
+        .catch(() => form.submit());
+    return false;
+}
+
+// Fetch the next page of task rows and append it to the list
+function fetchTaskPage(url) {
+    return fetch(url, {headers: {'X-Requested-With': 'XMLHttpRequest'}})
+        .then(response => {
+            if (!response.ok) {
+                throw new Error('Failed to load tasks');
+            }
+            const nextCursor = response.headers.get('X-Next-Cursor');
+            return response.text().then(html => ({html, nextCursor}));
+        });
+}
+
+// Point a "Show more" link at the page after nextCursor, or remove it after the last page
+function setNextCursor(link, nextCursor) {
+    if (nextCursor) {
+        const url = new URL(link.dataset.fragmentUrl, window.location.href);
+        url.searchParams.set('cursor', nextCursor);
+        link.dataset.fragmentUrl = url.pathname + url.search;
+        const fallback = new URL(link.href);
+        fallback.searchParams.set('cursor', nextCursor);
+        link.href = fallback.pathname + fallback.search;
+    } else {
+        if (link.observer) {
+            link.observer.disconnect();
+        }
+        link.remove();
+    }
+}
+
+function loadMoreTasks(link) {
+    if (link.dataset.loading) {
+        return;
+    }
+    link.dataset.loading = 'true';
+    fetchTaskPage(link.dataset.fragmentUrl)
+        .then(({html, nextCursor}) => {
+            document.getElementById(link.dataset.target).insertAdjacentHTML('beforeend', html);
+            setNextCursor(link, nextCursor);
+            delete link.dataset.loading;
+        })
+        .catch(() => {
+            delete link.dataset.loading;
+            createToast('Could not load more tasks. Please try again.', 'error');
+        });
+}
+
+// Live updates: apply changes made in other tabs and devices from the event stream
+function setupLiveUpdates() {
+    const main = document.getElementById('main-content');
+    if (!main || !main.dataset.eventsUrl || !('EventSource' in window)) {
+        return;
+    }
+    const source = new EventSource(main.dataset.eventsUrl);
+    source.addEventListener('changes', event => applyChanges(JSON.parse(event.data)));
+    source.addEventListener('resync', () => scheduleTaskListReload());
+}
+
+document.addEventListener('DOMContentLoaded', setupLiveUpdates);
+
+function applyChanges(changes) {
+    // New tasks, and tasks that may have moved between lists, need the lists reloaded
+    let reload = changes.created.length > 0;
+    changes.deleted.forEach(id => {
+        document.querySelectorAll(`[data-todo-id="${id}"]`).forEach(item => item.remove());
+    });
+    changes.updated.forEach(todo => {
+        const items = document.querySelectorAll(`[data-todo-id="${todo.id}"]`);
+        if (!items.length) {
+            reload = true;
+        }
+        items.forEach(item => {
+            if (item.dataset.category !== todo.category || item.dataset.dueDate !== (todo.due_date || '')) {
+                reload = true;
+                return;
+            }
+            item.classList.toggle('completed', todo.completed);
+            item.querySelector('.task-checkbox').checked = todo.completed;
+            item.querySelector('.task-text').textContent = todo.text;
+            item.querySelector('.priority-dot').className = `priority-dot priority-${todo.priority_key}`;
+        });
+    });
+    updateSidebarCounts(changes.counts);
+    if (reload) {
+        scheduleTaskListReload();
+    }
+}
+
+let taskListReloadTimer = null;
+
+// Coalesce bursts of events into one reload of the first page of each list
+function scheduleTaskListReload() {
+    clearTimeout(taskListReloadTimer);
+    taskListReloadTimer = setTimeout(() => {
+        document.querySelectorAll('.task-list[data-page-url]').forEach(list => {
+            fetchTaskPage(list.dataset.pageUrl)
+                .then(({html, nextCursor}) => {
+                    list.innerHTML = html;
+                    const link = document.querySelector(`.load-more[data-target="${list.id}"]`);
+                    if (link) {
+                        setNextCursor(link, nextCursor);
+                    }
+                })
+                .catch(() => {});
+        });
+    }, 300);
+}
@@ -0,0 +1,83 @@
+"""Per-user prefix cache for search-as-you-type suggestions.
+
+Results are cached per process in a bounded LRU and dropped whenever the
+user's todos change in this process (see ``receivers.py``). Writes made by
+other worker processes are picked up once an entry is older than
+``TODO_SUGGESTION_TTL`` seconds.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from .models import Todo
+from .search import get_search_backend
+
+# Number of suggestions cached per prefix; also the largest ?limit= accepted
+MAX_SUGGESTIONS = 10
+
+
+class SuggestionCache:
+    def __init__(self, max_entries=1000, ttl=60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id, prefix):
+        with self._lock:
+            entry = self._entries.get((user_id, prefix))
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] > self.ttl:
+                del self._entries[(user_id, prefix)]
+                return None
+            self._entries.move_to_end((user_id, prefix))
+            return entry[1]
+
+    def set(self, user_id, prefix, results):
+        with self._lock:
+            self._entries[(user_id, prefix)] = (time.monotonic(), results)
+            self._entries.move_to_end((user_id, prefix))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == user_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+suggestion_cache = SuggestionCache(
+    max_entries=getattr(settings, 'TODO_SUGGESTION_CACHE_SIZE', 1000),
+    ttl=getattr(settings, 'TODO_SUGGESTION_TTL', 60),
+)
+
+
+def get_suggestions(user, prefix):
+    """Return up to MAX_SUGGESTIONS ``(id, text)`` pairs matching ``prefix``"""
+    prefix = ' '.join(prefix.lower().split())
+    if not prefix:
+        return []
+    results = suggestion_cache.get(user.pk, prefix)
+    if results is not None:
+        return results
+
+    backend = get_search_backend()
+    # A shorter prefix with fewer than MAX_SUGGESTIONS results already holds
+    # every match for this one, so narrow it down without querying
+    for length in range(len(prefix) - 1, 0, -1):
+        shorter = suggestion_cache.get(user.pk, prefix[:length])
+        if shorter is not None and len(shorter) < MAX_SUGGESTIONS:
+            results = [(pk, text) for pk, text in shorter if backend.matches(text, prefix)]
+            break
+    else:
+        todos = backend.ranked(Todo.objects.filter(user=user), prefix)
+        results = list(todos.values_list('id', 'text')[:MAX_SUGGESTIONS])
+
+    suggestion_cache.set(user.pk, prefix, results)
+    return results
@@ -0,0 +1,104 @@
+import datetime
+
+from django import template
+from django.contrib.admin.templatetags.admin_list import date_hierarchy
+from django.db.models import Max, Min, Sum
+from django.db.models.functions import ExtractDay, ExtractMonth, ExtractYear
+from django.utils import formats
+from django.utils.text import capfirst
+from django.utils.translation import gettext as _
+from myapp.models import TodoDueDateCount
+
+register = template.Library()
+
+
+def title_with_count(title, count):
+    return f'{title} ({count:,})'
+
+
+@register.inclusion_tag('admin/date_hierarchy.html')
+def todo_due_date_hierarchy(cl):
+    """The changelist's due_date hierarchy, read from TodoDueDateCount.
+
+    The counts cover every todo, so when other filters or a search narrow
+    the list this falls back to the admin's own tag, which queries the
+    filtered rows.
+    """
+    field_name = cl.date_hierarchy
+    year_field = f'{field_name}__year'
+    month_field = f'{field_name}__month'
+    day_field = f'{field_name}__day'
+    # The due_date list_filter's __gte/__lt/__isnull params narrow the list too
+    other_filters = [name for name in cl.get_filters_params() if name not in (year_field, month_field, day_field)]
+    if cl.query or other_filters:
+        return date_hierarchy(cl)
+
+    year_lookup = cl.params.get(year_field)
+    month_lookup = cl.params.get(month_field)
+    day_lookup = cl.params.get(day_field)
+    counts = TodoDueDateCount.objects.filter(count__gt=0)
+
+    def link(filters):
+        return cl.get_query_string(filters, [f'{field_name}__'])
+
+    def totals(part, **filters):
+        return counts.filter(**filters).annotate(part=part).values('part').annotate(total=Sum('count')).order_by('part')
+
+    if not (year_lookup or month_lookup or day_lookup):
+        # Start at the narrowest level that holds every date, as the admin does
+        date_range = counts.aggregate(first=Min('due_date'), last=Max('due_date'))
+        if date_range['first'] and date_range['first'].year == date_range['last'].year:
+            year_lookup = date_range['first'].year
+            if date_range['first'].month == date_range['last'].month:
+                month_lookup = date_range['first'].month
+
+    if year_lookup and month_lookup and day_lookup:
+        day = datetime.date(int(year_lookup), int(month_lookup), int(day_lookup))
+        count = counts.filter(due_date=day).values_list('count', flat=True).first() or 0
+        return {
+            'show': True,
+            'back': {
+                'link': link({year_field: year_lookup, month_field: month_lookup}),
+                'title': capfirst(formats.date_format(day, 'YEAR_MONTH_FORMAT')),
+            },
+            'choices': [{'title': title_with_count(capfirst(formats.date_format(day, 'MONTH_DAY_FORMAT')), count)}],
+        }
+    if year_lookup and month_lookup:
+        days = totals(ExtractDay('due_date'), due_date__year=year_lookup, due_date__month=month_lookup)
+        return {
+            'show': True,
+            'back': {'link': link({year_field: year_lookup}), 'title': str(year_lookup)},
+            'choices': [
+                {
+                    'link': link({year_field: year_lookup, month_field: month_lookup, day_field: row['part']}),
+                    'title': title_with_count(capfirst(formats.date_format(
+                        datetime.date(int(year_lookup), int(month_lookup), row['part']), 'MONTH_DAY_FORMAT',
+                    )), row['total']),
+                }
+                for row in days
+            ],
+        }
+    if year_lookup:
+        months = totals(ExtractMonth('due_date'), due_date__year=year_lookup)
+        return {
+            'show': True,
+            'back': {'link': link({}), 'title': _('All dates')},
+            'choices': [
+                {
+                    'link': link({year_field: year_lookup, month_field: row['part']}),
+                    'title': title_with_count(capfirst(formats.date_format(
+                        datetime.date(int(year_lookup), row['part'], 1), 'YEAR_MONTH_FORMAT',
+                    )), row['total']),
+                }
+                for row in months
+            ],
+        }
+    years = totals(ExtractYear('due_date'))
+    return {
+        'show': True,
+        'back': None,
+        'choices': [
+            {'link': link({year_field: str(row['part'])}), 'title': title_with_count(str(row['part']), row['total'])}
+            for row in years
+        ],
+    }
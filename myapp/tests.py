@@ -1,3 +1,1018 @@
-from django.test import TestCase
+from contextlib import suppress
+import csv
+import pstats
+import tempfile
+from datetime import date, datetime, time, timedelta
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import Count
+from django.utils import timezone
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path, reverse
+from . import async_views, search
+from .api import validate_batch
+from .exports import EXPORT_FIELDS
+from .events import event_key, event_stream, get_last_event_id, publish_changes
+from .imports import import_todos, read_rows
+from .models import Todo, TodoChange, TodoCounters, TodoDueDateCount
+from .receivers import PendingRefresh, get_pending
+from .pagination import EstimatedCountPaginator
+from .profiling import get_profile_store
+from .reminders import send_due_reminders
+from .suggestions import get_suggestions, suggestion_cache
+
+
+# The task views routed to their async versions, as with TODO_ASYNC_VIEWS on
+urlpatterns = [
+    path('', async_views.home, name='home'),
+    path('tasks/', async_views.task_page, name='task_page'),
+    path('toggle/<int:todo_id>/', async_views.toggle_todo, name='toggle_todo'),
+    path('delete/<int:todo_id>/', async_views.delete_todo, name='delete_todo'),
+    path('', include('ToDo.urls')),
+]
+
+
+class Rollback(Exception):
+    pass
+
+
+class PendingRefreshTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='pw')
+
+    def test_rolled_back_savepoint_is_not_refreshed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with suppress(Rollback), transaction.atomic():
+                Todo.objects.create(user=self.user, text='ghost', due_date=date(2030, 1, 1))
+                raise Rollback
+            kept = Todo.objects.create(user=self.user, text='kept', due_date=date(2030, 1, 2))
+
+        self.assertEqual(list(TodoChange.objects.values_list('todo_id', flat=True)), [kept.pk])
+        self.assertEqual(
+            dict(TodoDueDateCount.objects.filter(count__gt=0).values_list('due_date', 'count')),
+            {date(2030, 1, 2): 1},
+        )
+
+    def test_one_refresh_per_transaction(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            for i in range(3):
+                Todo.objects.create(user=self.user, text=f'todo {i}')
+        self.assertEqual(len(callbacks), 1)
+
+    def test_pending_refresh_is_found_in_django_run_on_commit(self):
+        """get_pending() reads Django's private run_on_commit entries; this fails if their shape changes"""
+        connection = transaction.get_connection()
+
+        def registered():
+            return [entry for entry in connection.run_on_commit if isinstance(entry[1], PendingRefresh)]
+
+        self.assertIsNone(get_pending())
+        with self.captureOnCommitCallbacks():
+            Todo.objects.create(user=self.user, text='outer')
+            [(sids, outer, robust)] = registered()
+            self.assertEqual((sids, robust), (set(connection.savepoint_ids), False))
+            self.assertIs(get_pending(), outer)
+            with transaction.atomic():
+                # A savepoint gets its own refresh, which is dropped if it rolls back
+                Todo.objects.create(user=self.user, text='inner')
+                Todo.objects.create(user=self.user, text='inner again')
+                inner = get_pending()
+                self.assertEqual([func for _, func, _ in registered()], [outer, inner])
+                self.assertEqual(len(inner.created), 2)
+            self.assertIs(get_pending(), outer)
+            self.assertEqual(len(outer.created), 1)
+
+
+class PendingRefreshTransactionTests(TransactionTestCase):
+    def test_rolled_back_transaction_is_not_refreshed(self):
+        user = User.objects.create_user('alice', password='pw')
+        with suppress(Rollback), transaction.atomic():
+            Todo.objects.create(user=user, text='ghost', due_date=date(2030, 1, 1))
+            raise Rollback
+        with transaction.atomic():
+            kept = Todo.objects.create(user=user, text='kept', due_date=date(2030, 1, 2))
+
+        self.assertEqual(list(TodoChange.objects.values_list('todo_id', flat=True)), [kept.pk])
+        self.assertEqual(
+            dict(TodoDueDateCount.objects.filter(count__gt=0).values_list('due_date', 'count')),
+            {date(2030, 1, 2): 1},
+        )
+
+
+class DueDateCountTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='pw')
+
+    def assertCountsMatchTodos(self):
+        actual = {
+            row['due_date']: row['count']
+            for row in Todo.objects.exclude(due_date=None).order_by().values('due_date').annotate(count=Count('id'))
+        }
+        stored = dict(TodoDueDateCount.objects.filter(count__gt=0).values_list('due_date', 'count'))
+        self.assertEqual(stored, actual)
+
+    def test_counts_follow_every_kind_of_write(self):
+        first, second = date(2030, 1, 1), date(2030, 1, 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            todo = Todo.objects.create(user=self.user, text='a', due_date=first)
+            Todo.objects.create(user=self.user, text='b', due_date=first)
+            Todo.objects.create(user=self.user, text='c')
+        self.assertCountsMatchTodos()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            todo.due_date = second
+            todo.save()
+        self.assertCountsMatchTodos()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Todo.objects.filter(text='c').update(due_date=second)
+        self.assertCountsMatchTodos()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Todo.objects.filter(user=self.user).apply_batch('shift_due_date', 3)
+        self.assertCountsMatchTodos()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with suppress(Rollback), transaction.atomic():
+                Todo.objects.create(user=self.user, text='ghost', due_date=first)
+                Todo.objects.filter(user=self.user).update(due_date=first)
+                raise Rollback
+        self.assertCountsMatchTodos()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Todo.objects.get(pk=todo.pk).delete()
+            Todo.objects.filter(text='b').delete()
+        self.assertCountsMatchTodos()
+
+    def test_reconcile_corrects_drift(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Todo.objects.create(user=self.user, text='a', due_date=date(2030, 1, 1))
+        TodoDueDateCount.objects.filter(due_date=date(2030, 1, 1)).update(count=5)
+        TodoDueDateCount.objects.create(due_date=date(2030, 1, 1) + timedelta(days=1), count=2)
+
+        self.assertEqual(TodoDueDateCount.reconcile(), 2)
+        self.assertCountsMatchTodos()
+        self.assertEqual(TodoDueDateCount.reconcile(), 0)
+
+
+@override_settings(TODO_UPDATE_CHUNK_SIZE=2)
+class ChunkedUpdateTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='pw')
+        self.other = User.objects.create_user('bob', password='pw')
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(5):
+                Todo.objects.create(user=self.user if i % 2 else self.other, text=f'todo {i}', due_date=date(2030, 1, 1))
+
+    def test_large_update_covers_every_row_and_logs_a_reset(self):
+        TodoChange.objects.all().delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            # The filter no longer matches rows once they are updated
+            updated = Todo.objects.filter(completed=False).update(completed=True, due_date=date(2030, 1, 2))
+        self.assertEqual(updated, 5)
+        self.assertFalse(Todo.objects.filter(completed=False).exists())
+        self.assertEqual(dict(TodoDueDateCount.objects.filter(count__gt=0).values_list('due_date', 'count')), {date(2030, 1, 2): 5})
+        self.assertEqual(
+            sorted(TodoChange.objects.values_list('user_id', 'reset')), [(self.user.pk, True), (self.other.pk, True)],
+        )
+
+    def test_reset_tells_sync_clients_to_refetch(self):
+        cursor = TodoChange.objects.order_by('-id').values_list('id', flat=True).first()
+        with self.captureOnCommitCallbacks(execute=True):
+            Todo.objects.all().update(priority=Todo.HIGH)
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('api_todo_changes'), {'since': cursor})
+        self.assertTrue(response.json()['reset'])
+
+    def test_small_update_logs_each_todo(self):
+        todo = Todo.objects.filter(user=self.user).first()
+        TodoChange.objects.all().delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            Todo.objects.filter(pk=todo.pk).update(priority=Todo.HIGH)
+        self.assertEqual(list(TodoChange.objects.values_list('todo_id', 'reset')), [(todo.pk, False)])
+
+
+@override_settings(
+    TODO_QUERY_BUDGET_STRICT=True,
+    STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage',
+)
+class QueryBudgetTests(TransactionTestCase):
+    """Requests that would go over TODO_QUERY_BUDGETS raise QueryBudgetExceeded.
+
+    A TransactionTestCase, so the refresh that runs when a write commits is
+    counted, as it is in production.
+    """
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='pw')
+        tomorrow = timezone.now().date() + timedelta(days=1)
+        self.todos = [
+            Todo.objects.create(user=self.user, text=f'todo {i}', due_date=tomorrow, category='work')
+            for i in range(3)
+        ]
+        self.client.force_login(self.user)
+
+    def assertWithinBudget(self, response):
+        self.assertLess(response.status_code, 400)
+
+    def cold(self, request, *args, **kwargs):
+        """Make a request with no counters row, so the sidebar counts are recomputed"""
+        TodoCounters.objects.all().delete()
+        return request(*args, **kwargs)
+
+    def test_home(self):
+        for view in ['', 'upcoming', 'completed', 'missed']:
+            self.assertWithinBudget(self.client.get(reverse('home'), {'view': view}))
+        self.assertWithinBudget(self.client.get(reverse('home'), {'category': 'work'}))
+
+    def test_home_with_cold_counters(self):
+        TodoCounters.objects.all().delete()
+        self.assertWithinBudget(self.client.get(reverse('home')))
+        self.assertTrue(TodoCounters.objects.filter(user=self.user).exists())
+
+    def test_home_after_counters_day_rollover(self):
+        self.client.get(reverse('home'))
+        TodoCounters.objects.update(as_of=timezone.now().date() - timedelta(days=1))
+        self.assertWithinBudget(self.client.get(reverse('home')))
+
+    def test_batch(self):
+        one = [self.todos[0].pk]
+        every = [todo.pk for todo in self.todos]
+        for operation, value in [
+            ('shift_due_date', 2), ('complete', None), ('uncomplete', None),
+            ('set_priority', Todo.HIGH), ('set_category', 'home'), ('delete', None),
+        ]:
+            for ids in [one, every]:
+                response = self.cold(
+                    self.client.post, reverse('api_todo_batch'), {'operation': operation, 'value': value, 'ids': ids},
+                    content_type='application/json',
+                )
+                self.assertWithinBudget(response)
+
+    def test_single_todo_writes(self):
+        todo = self.todos[0]
+        ajax = {'HTTP_X_REQUESTED_WITH': 'XMLHttpRequest'}
+        self.assertWithinBudget(self.cold(self.client.post, reverse('toggle_todo', args=[todo.pk]), **ajax))
+        self.assertWithinBudget(self.cold(self.client.post, reverse('api_todo_toggle', args=[todo.pk])))
+        self.assertWithinBudget(self.cold(
+            self.client.post, reverse('edit_todo', args=[todo.pk]),
+            {'text': 'edited', 'due_date': date(2031, 1, 1), 'priority': Todo.HIGH, 'category': 'home'}, **ajax,
+        ))
+        self.assertWithinBudget(self.cold(
+            self.client.patch, reverse('api_todo_detail', args=[todo.pk]), {'due_date': '2031-02-01'},
+            content_type='application/json',
+        ))
+        self.assertWithinBudget(self.cold(self.client.delete, reverse('api_todo_detail', args=[todo.pk])))
+        self.assertWithinBudget(self.cold(self.client.post, reverse('delete_todo', args=[self.todos[1].pk]), **ajax))
+
+    def test_admin_changelist_actions(self):
+        self.user.is_staff = self.user.is_superuser = True
+        self.user.save()
+        url = reverse('admin:myapp_todo_changelist')
+        for params in [{}, {'user__id__exact': self.user.pk, 'due_date__gte': '2020-01-01', 'q': 'todo'}]:
+            cache.clear()
+            self.assertWithinBudget(self.client.get(url, params))
+        every = [todo.pk for todo in self.todos]
+        for action in ['mark_completed', 'mark_incomplete', 'set_high_priority', 'delete_selected']:
+            with self.subTest(action=action):
+                self.assertWithinBudget(self.cold(self.client.post, url, {'action': action, '_selected_action': every}))
+        response = self.cold(
+            self.client.post, url, {'action': 'delete_selected', '_selected_action': every[:1], 'post': 'yes'},
+        )
+        self.assertWithinBudget(response)
+        self.assertFalse(Todo.objects.filter(pk=every[0]).exists())
+
+    def test_request_lines_are_logged_at_debug(self):
+        with self.assertLogs('myapp.metrics', 'DEBUG') as logs:
+            self.client.get(reverse('home'))
+        self.assertEqual([record.levelname for record in logs.records], ['DEBUG'])
+        self.assertIn('"view": "home"', logs.output[0])
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='pw')
+        due_dates = [date(2030, 1, 2), None, date(2030, 1, 1), date(2030, 1, 2), None, date(2030, 1, 3), date(2030, 1, 1)]
+        for i, due_date in enumerate(due_dates):
+            Todo.objects.create(user=self.user, text=f'todo {i}', due_date=due_date, priority=[1, 2, 3][i % 3])
+        self.client.force_login(self.user)
+
+    def fetch_all(self, sort):
+        ids, cursor = [], None
+        while True:
+            params = {'sort': sort, 'limit': 2, 'fields': 'id'}
+            if cursor:
+                params['cursor'] = cursor
+            response = self.client.get(reverse('api_todo_list'), params)
+            self.assertEqual(response.status_code, 200)
+            ids += [todo['id'] for todo in response.json()['results']]
+            cursor = response.json()['next_cursor']
+            if not cursor:
+                return ids
+
+    def test_cursor_round_trip_visits_every_todo_once_in_order(self):
+        for sort, ordering in Todo.SORT_ORDERINGS.items():
+            todos = sorted(Todo.objects.all(), key=lambda todo: (todo.created_at, todo.id), reverse=True)
+            todos.sort(key=lambda todo: (todo.due_date is None, todo.due_date or date.min))
+            if sort == 'priority':
+                todos.sort(key=lambda todo: -todo.priority)
+            elif sort == 'due':
+                todos = sorted(todos, key=lambda todo: (todo.created_at, todo.id), reverse=True)
+                todos.sort(key=lambda todo: -todo.priority)
+                todos.sort(key=lambda todo: (todo.due_date is None, todo.due_date or date.min))
+            with self.subTest(sort=sort):
+                self.assertEqual(self.fetch_all(sort), [todo.pk for todo in todos])
+
+    def test_bad_cursor_is_rejected(self):
+        for cursor in ['not a cursor!', 'WzFd', 'WyJub3QtYS1kYXRlIiwgIngiLCAxXQ']:
+            with self.subTest(cursor=cursor):
+                response = self.client.get(reverse('api_todo_list'), {'cursor': cursor})
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {'error': 'Invalid cursor.'})
+
+
+@override_settings(TODO_CHANGE_LOG_SETTLE_SECONDS=0)
+class TodoChangesTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='pw')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.todos = [Todo.objects.create(user=self.user, text=f'todo {i}') for i in range(4)]
+        self.ids = list(TodoChange.objects.order_by('id').values_list('id', flat=True))
+        self.client.force_login(self.user)
+
+    def changes(self, since):
+        return self.client.get(reverse('api_todo_changes'), {'since': since}).json()
+
+    def test_sync_from_a_cursor(self):
+        response = self.changes(self.ids[1])
+        self.assertFalse(response['reset'])
+        self.assertEqual(sorted(todo['id'] for todo in response['changed']), [todo.pk for todo in self.todos[2:]])
+        self.assertEqual(response['cursor'], str(self.ids[-1]))
+
+    def test_cursor_before_the_pruned_prefix_resets(self):
+        TodoChange.objects.filter(id__lte=self.ids[1]).update(changed_at=timezone.now() - timedelta(days=60))
+        call_command('prune_todo_changes', days=30, stdout=StringIO())
+        # Clients that synced up to the last pruned entry have missed nothing
+        self.assertFalse(self.changes(self.ids[1])['reset'])
+        response = self.changes(self.ids[0])
+        self.assertTrue(response['reset'])
+        self.assertEqual(response['cursor'], str(self.ids[-1]))
+
+    @override_settings(TODO_CHANGE_LOG_SETTLE_SECONDS=60)
+    def test_cursor_trails_changes_that_may_not_have_settled(self):
+        response = self.changes(self.ids[1])
+        self.assertEqual(sorted(todo['id'] for todo in response['changed']), [todo.pk for todo in self.todos[2:]])
+        # An entry with a lower id could still be committing
+        self.assertEqual(response['cursor'], str(self.ids[1]))
+        self.assertEqual(self.client.get(reverse('api_todo_changes')).json()['cursor'], str(self.ids[0] - 1))
+
+        TodoChange.objects.filter(id__lte=self.ids[2]).update(changed_at=timezone.now() - timedelta(minutes=2))
+        self.assertEqual(self.changes(self.ids[1])['cursor'], str(self.ids[2]))
+        self.assertEqual(self.client.get(reverse('api_todo_changes')).json()['cursor'], str(self.ids[2]))
+
+    def test_missing_and_future_cursors_reset(self):
+        self.assertTrue(self.client.get(reverse('api_todo_changes')).json()['reset'])
+        self.assertTrue(self.changes(self.ids[-1] + 1)['reset'])
+        self.assertEqual(self.client.get(reverse('api_todo_changes'), {'since': 'x'}).status_code, 400)
+
+
+class ImportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='pw')
+
+    def test_csv_rows_that_fail_are_reported_by_line(self):
+        content = (
+            'text,due_date,priority,category\n'
+            'first,2030-01-01,3,work\n'
+            ',2030-01-01,3,work\n'
+            'bad date,someday,,\n'
+            'bad priority,,9,\n'
+            'last,,,\n'
+        ).encode()
+        with self.captureOnCommitCallbacks(execute=True):
+            report = import_todos(self.user, read_rows(BytesIO(content), 'csv'), batch_size=1)
+        self.assertEqual((report['created'], report['failed']), (2, 3))
+        self.assertEqual([failure['line'] for failure in report['errors']], [3, 4, 5])
+        self.assertEqual(list(report['errors'][0]['errors']), ['text'])
+        self.assertEqual(list(report['errors'][1]['errors']), ['due_date'])
+        self.assertEqual(list(report['errors'][2]['errors']), ['priority'])
+        self.assertEqual(sorted(Todo.objects.values_list('text', flat=True)), ['first', 'last'])
+        self.assertEqual(TodoChange.objects.count(), 2)
+
+    def test_unreadable_ndjson_lines_are_reported(self):
+        content = b'{"text": "ok"}\nnot json\n\n[1, 2]\n{"text": "done", "completed": true}\n'
+        report = import_todos(self.user, read_rows(BytesIO(content), 'ndjson'), batch_size=10)
+        self.assertEqual((report['created'], report['failed']), (2, 2))
+        self.assertEqual(report['errors'], [
+            {'line': 2, 'errors': {'__all__': ['Could not read this line.']}},
+            {'line': 4, 'errors': {'__all__': ['Could not read this line.']}},
+        ])
+        self.assertTrue(Todo.objects.get(text='done').completed)
+
+    def test_bulk_create_does_what_save_would(self):
+        due_date = timezone.now().date() + timedelta(days=3)
+        with self.captureOnCommitCallbacks(execute=True):
+            todos = Todo.objects.bulk_create(
+                Todo(user=self.user, text=f'todo {i}', due_date=due_date, completed=i == 2) for i in range(3)
+            )
+        self.assertEqual([todo.next_reminder_at is not None for todo in todos], [True, True, False])
+        self.assertEqual(Todo.objects.exclude(next_reminder_at=None).count(), 2)
+        self.assertEqual(TodoDueDateCount.objects.get(due_date=due_date).count, 3)
+        self.assertEqual(sorted(TodoChange.objects.values_list('todo_id', flat=True)), [todo.pk for todo in todos])
+        self.assertEqual(TodoCounters.for_user(self.user)['upcoming_count'], 3)
+
+
+class BatchValidationTests(TestCase):
+    def test_invalid_batches(self):
+        for data in [
+            {'operation': 'complete'},
+            {'operation': 'complete', 'ids': []},
+            {'operation': 'complete', 'ids': ['1']},
+            {'operation': 'complete', 'ids': list(range(1001))},
+            {'operation': 'archive', 'ids': [1]},
+            {'operation': 'set_priority', 'ids': [1], 'value': 4},
+            {'operation': 'set_priority', 'ids': [1], 'value': True},
+            {'operation': 'set_priority', 'ids': [1], 'value': 2.0},
+            {'operation': 'set_priority', 'ids': [1], 'value': '3'},
+            {'operation': 'set_category', 'ids': [1], 'value': 'garden'},
+            {'operation': 'shift_due_date', 'ids': [1], 'value': 3651},
+            {'operation': 'shift_due_date', 'ids': [1], 'value': True},
+            {'operation': 'shift_due_date', 'ids': [1], 'value': 1.5},
+        ]:
+            with self.subTest(data=data):
+                self.assertIsNotNone(validate_batch(data))
+
+    def test_valid_batches(self):
+        for data in [
+            {'operation': 'complete', 'ids': [1, 2]},
+            {'operation': 'set_priority', 'ids': [1], 'value': Todo.HIGH},
+            {'operation': 'set_category', 'ids': [1], 'value': 'home'},
+            {'operation': 'shift_due_date', 'ids': [1], 'value': -7},
+        ]:
+            with self.subTest(data=data):
+                self.assertIsNone(validate_batch(data))
+
+    def test_invalid_batch_request_changes_nothing(self):
+        user = User.objects.create_user('alice', password='pw')
+        todo = Todo.objects.create(user=user, text='todo')
+        self.client.force_login(user)
+        response = self.client.post(
+            reverse('api_todo_batch'), {'operation': 'set_priority', 'ids': [todo.pk], 'value': 7},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Todo.objects.get().priority, Todo.MEDIUM)
+
+    def test_unknown_operation(self):
+        with self.assertRaises(ValueError):
+            Todo.objects.all().apply_batch('archive')
+
+
+class ReminderTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', email='alice@example.com', password='pw')
+        self.due_at = timezone.make_aware(datetime.combine(date.today() + timedelta(days=1), time(12, 0)))
+        self.todo = Todo.objects.create(user=self.user, text='call', due_date=self.due_at.date(), due_time=time(12, 0))
+        # Inside the reminder lead time
+        self.now = self.due_at - timedelta(minutes=10)
+
+    def test_reminder_is_sent_once(self):
+        self.assertEqual(send_due_reminders(10, self.now), (1, 1))
+        self.assertEqual(send_due_reminders(10, self.now), (0, 0))
+        self.assertEqual(send_due_reminders(10, self.now + timedelta(minutes=5)), (0, 0))
+        self.assertEqual(len(mail.outbox), 1)
+        self.todo.refresh_from_db()
+        self.assertEqual(self.todo.reminder_sent_at, self.now)
+        self.assertIsNone(self.todo.next_reminder_at)
+
+    def test_claimed_batch_is_not_sent_by_another_worker(self):
+        other = Todo.objects.create(user=self.user, text='write', due_date=self.due_at.date(), due_time=time(12, 0))
+        # A worker that claims one reminder and then stops before sending it
+        claimed = Todo.objects.filter(pk__in=Todo.objects.due_reminders(self.now).values('pk')[:1])
+        claimed.set_reminder(next_reminder_at=self.now + timedelta(minutes=10))
+        self.assertEqual(send_due_reminders(10, self.now), (1, 1))
+        self.assertEqual([message.subject for message in mail.outbox], [f'Reminder: {other.text}'])
+
+    def test_completed_todo_is_not_reminded(self):
+        Todo.objects.filter(pk=self.todo.pk).set_reminder(next_reminder_at=self.now - timedelta(minutes=1))
+        Todo.objects.filter(pk=self.todo.pk)._toggle_completed()
+        self.assertEqual(send_due_reminders(10, self.now), (1, 0))
+        self.assertEqual(mail.outbox, [])
+
+
+class QueryPlanTests(TestCase):
+    def test_hot_queries_use_their_indexes(self):
+        users = [User.objects.create_user(f'user{i}', password='pw') for i in range(20)]
+        today = timezone.now().date()
+        Todo.objects.bulk_create([
+            Todo(
+                user=users[i % len(users)], text=f'todo {i}', completed=i % 3 == 0, category=['work', 'home', 'personal'][i % 3],
+                priority=i % 3 + 1, due_date=today + timedelta(days=i % 60 - 30) if i % 4 else None,
+                next_reminder_at=timezone.now() + timedelta(hours=i) if i % 50 == 0 else None,
+            )
+            for i in range(4000)
+        ])
+        TodoChange.objects.bulk_create([TodoChange(user=users[i % len(users)], todo_id=i) for i in range(4000)])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        # Raises CommandError naming any query that does not use its index
+        call_command('explain_queries', '--check', user=users[0].username, stdout=StringIO())
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        search._installed.clear()
+        self.addCleanup(search._installed.clear)
+        self.user = User.objects.create_user('alice', password='pw')
+        self.todo = Todo.objects.create(user=self.user, text='Buy groceries and milk')
+        Todo.objects.create(user=self.user, text='Buy groceries')
+
+    def found(self, query):
+        return list(search.search_todos(Todo.objects.all(), query).values_list('text', flat=True))
+
+    def test_every_word_is_matched_as_a_prefix(self):
+        self.assertEqual(self.found('gro mil'), ['Buy groceries and milk'])
+        self.assertEqual(sorted(self.found('BUY groc')), ['Buy groceries', 'Buy groceries and milk'])
+
+    def test_index_follows_inserts_updates_and_deletes(self):
+        Todo.objects.create(user=self.user, text='Call the plumber')
+        self.assertEqual(self.found('plumb'), ['Call the plumber'])
+        self.todo.text = 'Pay rent'
+        self.todo.save()
+        self.assertEqual(self.found('milk'), [])
+        self.assertEqual(self.found('rent'), ['Pay rent'])
+        self.todo.delete()
+        self.assertEqual(self.found('rent'), [])
+
+    @override_settings(TODO_SEARCH_BACKEND='like')
+    def test_like_fallback_matches_substrings(self):
+        self.assertIsInstance(search.get_search_backend(), search.LikeSearchBackend)
+        self.assertEqual(self.found('and mil'), ['Buy groceries and milk'])
+        self.assertEqual(self.found('gro mil'), [])
+
+
+class SuggestionTests(TestCase):
+    def setUp(self):
+        suggestion_cache.clear()
+        self.addCleanup(suggestion_cache.clear)
+        self.user = User.objects.create_user('alice', password='pw')
+        with self.captureOnCommitCallbacks(execute=True):
+            for text in ['Call Bob about the budget', 'Buy milk', 'Book flights', 'Buy groceries']:
+                Todo.objects.create(user=self.user, text=text)
+            Todo.objects.create(user=User.objects.create_user('bob', password='pw'), text='Buy a bike')
+        self.client.force_login(self.user)
+
+    def suggest(self, **params):
+        response = self.client.get(reverse('api_todo_suggest'), params)
+        self.assertEqual(response.status_code, 200)
+        return [suggestion['text'] for suggestion in response.json()['suggestions']]
+
+    def test_best_matches_come_first(self):
+        self.assertEqual(self.suggest(q='bu'), ['Buy groceries', 'Buy milk', 'Call Bob about the budget'])
+        self.assertEqual(self.suggest(q='  BUY   m '), ['Buy milk'])
+        self.assertEqual(self.suggest(q='bu', limit=1), ['Buy groceries'])
+        self.assertEqual(len(self.suggest(q='bu', limit='many')), 3)
+        self.assertEqual(self.suggest(q=' '), [])
+
+    def test_longer_prefixes_are_narrowed_from_the_cache(self):
+        get_suggestions(self.user, 'b')
+        with self.assertNumQueries(0):
+            self.assertEqual([text for _, text in get_suggestions(self.user, 'buy g')], ['Buy groceries'])
+
+    def test_writes_invalidate_the_cache(self):
+        self.assertEqual(self.suggest(q='pay'), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            todo = Todo.objects.create(user=self.user, text='Pay rent')
+        self.assertEqual(self.suggest(q='pay'), ['Pay rent'])
+        with self.captureOnCommitCallbacks(execute=True):
+            Todo.objects.filter(pk=todo.pk).update(text='Pay the gas bill')
+        self.assertEqual(self.suggest(q='pay'), ['Pay the gas bill'])
+        with self.captureOnCommitCallbacks(execute=True):
+            todo.delete()
+        self.assertEqual(self.suggest(q='pay'), [])
+
+
+@skipUnless(connection.vendor == 'sqlite', 'SQLite FTS5 index')
+class SQLiteSearchIndexTests(TestCase):
+    def setUp(self):
+        search._installed.clear()
+        self.addCleanup(search._installed.clear)
+        self.user = User.objects.create_user('alice', password='pw')
+
+    def indexed_ids(self, query):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT rowid FROM myapp_todo_fts WHERE myapp_todo_fts MATCH %s', [query])
+            return [row[0] for row in cursor.fetchall()]
+
+    def test_triggers_keep_the_index_in_sync(self):
+        todo = Todo.objects.create(user=self.user, text='Water the plants')
+        self.assertEqual(self.indexed_ids('plants'), [todo.pk])
+        Todo.objects.filter(pk=todo.pk).update(text='Feed the cat')
+        self.assertEqual(self.indexed_ids('plants'), [])
+        self.assertEqual(self.indexed_ids('cat'), [todo.pk])
+        Todo.objects.filter(pk=todo.pk).delete()
+        self.assertEqual(self.indexed_ids('cat'), [])
+
+    def test_missing_trigger_falls_back_to_like(self):
+        self.assertIsInstance(search.get_search_backend(), search.SQLiteSearchBackend)
+        search._installed.clear()
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER myapp_todo_fts_au')
+        self.assertIsInstance(search.get_search_backend(), search.LikeSearchBackend)
+        call_command('rebuild_search_index', stdout=StringIO())
+        search._installed.clear()
+        self.assertIsInstance(search.get_search_backend(), search.SQLiteSearchBackend)
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class HomeFragmentCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('alice', password='pw')
+        self.client.force_login(self.user)
+
+    def test_sidebar_counts_move_at_midnight(self):
+        now = timezone.now()
+        Todo.objects.create(user=self.user, text='tomorrow', due_date=now.date() + timedelta(days=1))
+        self.assertContains(self.client.get(reverse('home')), 'aria-label="0 tasks for today"')
+        with mock.patch('django.utils.timezone.now', return_value=now + timedelta(days=1)):
+            self.assertContains(self.client.get(reverse('home')), 'aria-label="1 tasks for today"')
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class HomeETagTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            'alice', password='pw', first_name='Alice', last_name='Smith', email='alice@example.com',
+        )
+        self.client.force_login(self.user)
+        self.todo = Todo.objects.create(user=self.user, text='todo', due_date=timezone.now().date())
+
+    def revalidate(self):
+        response = self.client.get(reverse('home'))
+        self.assertEqual(response.status_code, 200)
+        return self.client.get(reverse('home'), HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_repeat_visit_is_not_modified(self):
+        # The first response also sets the CSRF cookie, which must not change the ETag
+        self.assertNotIn('csrftoken', self.client.cookies)
+        self.assertEqual(self.revalidate().status_code, 304)
+
+    def test_write_changes_the_etag(self):
+        etag = self.client.get(reverse('home'))['ETag']
+        self.client.post(reverse('toggle_todo', args=[self.todo.pk]))
+        self.assertEqual(self.client.get(reverse('home'), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_flash_message_is_never_not_modified(self):
+        etag = self.client.get(reverse('home'))['ETag']
+        # Saving the profile unchanged only queues a message
+        self.client.post(
+            reverse('edit_profile'),
+            {'first_name': 'Alice', 'last_name': 'Smith', 'email': 'alice@example.com', 'username': 'alice'},
+        )
+        response = self.client.get(reverse('home'), HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Profile updated successfully!')
+        self.assertEqual(self.client.get(reverse('home'), HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
+class TodoApiTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='pw')
+        self.todo = Todo.objects.create(user=self.user, text='todo')
+        self.new_todo = {'text': 'new', 'priority': Todo.MEDIUM, 'category': 'work'}
+        self.client.force_login(self.user)
+
+    def test_completed_must_be_a_boolean(self):
+        url = reverse('api_todo_detail', args=[self.todo.pk])
+        for completed in ['false', 0, 1, None, []]:
+            with self.subTest(completed=completed):
+                response = self.client.post(
+                    reverse('api_todo_list'), {**self.new_todo, 'completed': completed}, content_type='application/json',
+                )
+                self.assertEqual(response.status_code, 400)
+                response = self.client.patch(url, {'completed': completed}, content_type='application/json')
+                self.assertEqual(response.status_code, 400)
+        self.assertEqual(Todo.objects.count(), 1)
+        self.assertFalse(Todo.objects.get().completed)
+
+        response = self.client.patch(url, {'completed': True}, content_type='application/json')
+        self.assertIs(response.json()['completed'], True)
+        response = self.client.post(reverse('api_todo_list'), self.new_todo, content_type='application/json')
+        self.assertIs(response.json()['completed'], False)
+
+
+@override_settings(
+    ROOT_URLCONF='myapp.tests',
+    STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage',
+)
+class AsyncViewTests(TestCase):
+    ajax = {'X-Requested-With': 'XMLHttpRequest'}
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('alice', password='pw')
+        today = timezone.now().date()
+        self.todos = [Todo.objects.create(user=self.user, text=f'todo {i}', due_date=today) for i in range(3)]
+
+    async def login(self):
+        await sync_to_async(self.async_client.force_login)(self.user)
+
+    async def test_login_is_required(self):
+        response = await self.async_client.get(reverse('home'))
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response['Location'].startswith(reverse('login')))
+
+    async def test_home_renders_and_revalidates(self):
+        await self.login()
+        response = await self.async_client.get(reverse('home'))
+        self.assertIs(response.resolver_match.func, async_views.home)
+        self.assertContains(response, 'todo 2')
+        response = await self.async_client.get(reverse('home'), headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    async def test_task_page_returns_the_next_cursor(self):
+        await self.login()
+        response = await self.async_client.get(reverse('task_page'), {'limit': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content.decode().count('data-todo-id'), 2)
+        response = await self.async_client.get(reverse('task_page'), {'limit': 2, 'cursor': response['X-Next-Cursor']})
+        self.assertEqual(response.content.decode().count('data-todo-id'), 1)
+        self.assertNotIn('X-Next-Cursor', response)
+
+    async def test_ajax_toggle_and_delete(self):
+        await self.login()
+        todo = self.todos[0]
+        response = await self.async_client.post(reverse('toggle_todo', args=[todo.pk]), headers=self.ajax)
+        self.assertEqual(response.json()['id'], todo.pk)
+        self.assertIs(response.json()['completed'], True)
+        self.assertIn('today_count', response.json()['counts'])
+        self.assertTrue((await Todo.objects.aget(pk=todo.pk)).completed)
+
+        response = await self.async_client.post(reverse('delete_todo', args=[todo.pk]), headers=self.ajax)
+        self.assertEqual((response.json()['id'], response.json()['deleted']), (todo.pk, True))
+        self.assertFalse(await Todo.objects.filter(pk=todo.pk).aexists())
+
+    async def test_toggle_redirects_without_ajax(self):
+        await self.login()
+        response = await self.async_client.post(reverse('toggle_todo', args=[self.todos[0].pk]))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response['Location'], reverse('home'))
+
+    async def test_other_users_todos_are_not_found(self):
+        other = await sync_to_async(User.objects.create_user)('bob', password='pw')
+        todo = await Todo.objects.acreate(user=other, text="Bob's todo")
+        await self.login()
+        for name in ['toggle_todo', 'delete_todo']:
+            response = await self.async_client.post(reverse(name, args=[todo.pk]), headers=self.ajax)
+            self.assertEqual(response.status_code, 404)
+        self.assertFalse((await Todo.objects.aget(pk=todo.pk)).completed)
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class ProfilingTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        profile_settings = self.settings(TODO_PROFILE_DIR=directory.name, TODO_PROFILE_MAX_FILES=2)
+        profile_settings.enable()
+        self.addCleanup(profile_settings.disable)
+        self.user = User.objects.create_user('alice', password='pw', is_staff=True)
+        self.client.force_login(self.user)
+
+    def test_off_by_default(self):
+        response = self.client.get(reverse('home'), {'profile': '1'})
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertEqual(get_profile_store().profiles(), [])
+
+    @override_settings(TODO_PROFILING=True)
+    def test_staff_requests_that_opt_in_are_profiled(self):
+        self.assertNotIn('X-Profile-Id', self.client.get(reverse('home')))
+        response = self.client.get(reverse('home'), {'profile': '1'})
+        name = response['X-Profile-Id']
+        [profile] = get_profile_store().profiles()
+        self.assertEqual((profile['name'], profile['view'], profile['user'], profile['status']), (name, 'home', 'alice', 200))
+        pstats.Stats(str(get_profile_store().stats_path(name)))
+
+        self.assertIn('X-Profile-Id', self.client.get(reverse('task_page'), headers={'X-Profile': '1'}))
+        self.client.get(reverse('api_todo_list'), {'profile': '1'})
+        # Only the newest TODO_PROFILE_MAX_FILES are kept
+        self.assertEqual(len(get_profile_store().names()), 2)
+        self.assertNotIn(name, get_profile_store().names())
+
+    @override_settings(TODO_PROFILING=True)
+    def test_other_users_and_unsampled_requests_are_not_profiled(self):
+        self.client.force_login(User.objects.create_user('bob', password='pw'))
+        self.assertNotIn('X-Profile-Id', self.client.get(reverse('home'), {'profile': '1'}))
+        self.client.force_login(self.user)
+        with self.settings(TODO_PROFILE_SAMPLE_RATE=0):
+            self.assertNotIn('X-Profile-Id', self.client.get(reverse('home'), {'profile': '1'}))
+
+    @override_settings(TODO_PROFILING=True)
+    def test_admin_lists_and_downloads_profiles(self):
+        self.user.is_superuser = True
+        self.user.save()
+        name = self.client.get(reverse('home'), {'profile': '1'})['X-Profile-Id']
+        self.assertContains(self.client.get(reverse('admin:myapp_todo_profiles')), name)
+        response = self.client.get(reverse('admin:myapp_todo_profile_download', args=[name]))
+        self.assertEqual(response['Content-Disposition'], f'attachment; filename="{name}.prof"')
+        response = self.client.get(reverse('admin:myapp_todo_profile_download', args=['settings']))
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(TODO_EXPORT_CHUNK_SIZE=2)
+class ExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='pw')
+        self.todos = [
+            Todo.objects.create(user=self.user, text='Call Bob, then "Alice"', due_date=date(2030, 1, 2), priority=Todo.HIGH),
+            Todo.objects.create(user=self.user, text='No due date'),
+            Todo.objects.create(
+                user=self.user, text='Pack; ' + 'é' * 60, due_date=date(2030, 1, 3), due_time=time(9, 30),
+                priority=Todo.LOW, completed=True,
+            ),
+        ]
+        Todo.objects.create(user=User.objects.create_user('bob', password='pw'), text="Bob's todo")
+        self.client.force_login(self.user)
+
+    def export(self, export_format):
+        response = self.client.get(reverse('api_todo_export'), {'format': export_format})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_holds_every_todo_of_the_user_in_order(self):
+        rows = list(csv.reader(StringIO(self.export('csv'))))
+        self.assertEqual(rows[0], EXPORT_FIELDS)
+        self.assertEqual([row[1] for row in rows[1:]], [todo.text for todo in self.todos])
+        self.assertEqual(rows[3][3:6], ['2030-01-03', '09:30:00', str(Todo.LOW)])
+
+    def test_ics_holds_todos_with_a_due_date(self):
+        content = self.export('ics')
+        self.assertTrue(content.startswith('BEGIN:VCALENDAR\r\n'))
+        self.assertTrue(content.endswith('END:VCALENDAR\r\n'))
+        self.assertEqual(content.count('BEGIN:VTODO'), 2)
+        self.assertNotIn('No due date', content)
+        self.assertIn('SUMMARY:Call Bob\\, then "Alice"\r\n', content)
+        self.assertIn('DUE;VALUE=DATE:20300102\r\n', content)
+        self.assertIn('PRIORITY:1\r\n', content)
+        self.assertIn('STATUS:COMPLETED\r\n', content)
+        self.assertTrue(all(len(line.encode()) <= 75 for line in content.split('\r\n')))
+        # Unfolding joins the long summary back together
+        self.assertIn('SUMMARY:Pack\\; ' + 'é' * 60 + '\r\n', content.replace('\r\n ', ''))
+
+    def test_unknown_format_is_rejected(self):
+        self.assertEqual(self.client.get(reverse('api_todo_export'), {'format': 'xml'}).status_code, 400)
+
+    async def test_asgi_exports_stream_asynchronously(self):
+        expected = await sync_to_async(self.export)('csv')
+        await sync_to_async(self.async_client.force_login)(self.user)
+        response = await self.async_client.get(reverse('api_todo_export'), {'format': 'csv'})
+        self.assertTrue(response.is_async)
+        chunks = [chunk async for chunk in response.streaming_content]
+        # The header and three rows, two rows per chunk
+        self.assertEqual(len(chunks), 2)
+        self.assertEqual(b''.join(chunks).decode(), expected)
+
+
+@override_settings(TODO_LIVE_UPDATES=True, TODO_EVENT_POLL_INTERVAL=0, TODO_EVENT_STREAM_TIMEOUT=0.05)
+class LiveUpdateTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('alice', password='pw')
+
+    def test_committed_writes_publish_one_event_per_transaction(self):
+        TodoCounters.for_user(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            todo = Todo.objects.create(user=self.user, text='new', category='work')
+            Todo.objects.create(user=self.user, text='other')
+        self.assertEqual(get_last_event_id(self.user.pk), 1)
+        event = cache.get(event_key(self.user.pk, 1))
+        self.assertEqual(sorted(row['text'] for row in event['created']), ['new', 'other'])
+        self.assertEqual(event['counts']['work_count'], 1)
+
+        pk = todo.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            todo.delete()
+        self.assertEqual(cache.get(event_key(self.user.pk, 2))['deleted'], [pk])
+
+    def test_rolled_back_writes_publish_nothing(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with suppress(Rollback), transaction.atomic():
+                Todo.objects.create(user=self.user, text='ghost')
+                raise Rollback
+        self.assertEqual(get_last_event_id(self.user.pk), 0)
+
+    def test_reset_users_get_a_resync_event(self):
+        publish_changes([], [], {}, reset={self.user.pk})
+        self.assertTrue(cache.get(event_key(self.user.pk, 1))['resync'])
+
+    async def stream(self, last_event_id):
+        return [chunk async for chunk in event_stream(self.user.pk, last_event_id)]
+
+    async def test_stream_replays_events_after_the_last_id(self):
+        await sync_to_async(publish_changes)([], [], {1: self.user.pk})
+        await sync_to_async(publish_changes)([], [], {2: self.user.pk})
+        chunks = await self.stream(1)
+        self.assertEqual(chunks[0], 'retry: 3000\n\n')
+        self.assertEqual(len(chunks), 2)
+        self.assertTrue(chunks[1].startswith('id: 2\nevent: changes\n'))
+        self.assertIn('"deleted": [2]', chunks[1])
+
+    async def test_stream_resyncs_clients_that_fell_behind(self):
+        await sync_to_async(publish_changes)([], [], {}, reset={self.user.pk})
+        self.assertEqual(await self.stream(0), ['retry: 3000\n\n', 'id: 1\nevent: resync\ndata: {}\n\n'])
+        await cache.adelete(event_key(self.user.pk, 1))
+        await sync_to_async(publish_changes)([], [], {3: self.user.pk})
+        # Event 1 expired, so the client cannot be caught up
+        self.assertEqual((await self.stream(0))[1], 'id: 2\nevent: resync\ndata: {}\n\n')
+
+    def test_events_need_asgi(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('todo_events')).status_code, 404)
+
+    async def test_events_stream_over_asgi(self):
+        await sync_to_async(self.async_client.force_login)(self.user)
+        response = await self.async_client.get(reverse('todo_events'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual([chunk async for chunk in response.streaming_content], [b'retry: 3000\n\n'])
+        with self.settings(TODO_LIVE_UPDATES=False):
+            self.assertEqual((await self.async_client.get(reverse('todo_events'))).status_code, 404)
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class TodoAdminTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        self.client.force_login(self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            for day in [date(2030, 1, 1), date(2030, 1, 2), date(2030, 1, 5), date(2030, 2, 1), date(2030, 2, 2)]:
+                Todo.objects.create(user=self.admin, text=f'due {day}', due_date=day)
+
+    def test_date_hierarchy_counts_every_todo(self):
+        response = self.client.get(reverse('admin:myapp_todo_changelist'))
+        self.assertContains(response, 'January 2030 (3)')
+        self.assertContains(response, 'February 2030 (2)')
+
+    def test_date_hierarchy_follows_the_due_date_filter(self):
+        response = self.client.get(
+            reverse('admin:myapp_todo_changelist'), {'due_date__gte': '2030-01-01', 'due_date__lt': '2030-01-02'},
+        )
+        self.assertEqual(response.context['cl'].result_count, 1)
+        # The admin's own hierarchy, without histogram counts
+        self.assertNotContains(response, 'January 2030 (')
+        self.assertNotContains(response, 'February 2030')
+
+    def test_bulk_actions_clear_the_cached_stats(self):
+        url = reverse('admin:myapp_todo_changelist')
+        self.assertEqual(self.client.get(url).context['total_todos'], 5)
+        # Writes outside the admin wait for the cache to expire
+        Todo.objects.create(user=self.admin, text='new')
+        self.assertEqual(self.client.get(url).context['total_todos'], 5)
+
+        self.client.post(url, {'action': 'export_csv', '_selected_action': [Todo.objects.first().pk]})
+        self.assertEqual(self.client.get(url).context['total_todos'], 5)
+
+        self.client.post(url, {'action': 'mark_completed', '_selected_action': list(Todo.objects.values_list('pk', flat=True))})
+        response = self.client.get(url)
+        self.assertEqual((response.context['total_todos'], response.context['completed_todos']), (6, 6))
+        self.assertEqual(response.context['completion_rate'], 100.0)
+
+    @override_settings(TODO_ADMIN_ESTIMATED_COUNT_THRESHOLD=0)
+    def test_paginator_counts_exactly_without_postgresql_estimates(self):
+        if connection.vendor == 'postgresql':
+            self.skipTest('PostgreSQL uses the planner estimate')
+        self.assertEqual(EstimatedCountPaginator(Todo.objects.all(), 2).count, 5)
+        response = self.client.get(reverse('admin:myapp_todo_changelist'), {'q': 'due 2030-01'})
+        self.assertEqual(response.context['cl'].paginator.count, 3)
+
+    def test_user_filter(self):
+        other = User.objects.create_user('bob', password='pw')
+        Todo.objects.create(user=other, text="Bob's todo")
+        url = reverse('admin:myapp_todo_changelist')
+        response = self.client.get(url, {'user__id__exact': other.pk})
+        self.assertEqual([todo.text for todo in response.context['cl'].result_list], ["Bob's todo"])
+        self.assertContains(response, 'data-ajax--url')
+        self.assertRedirects(self.client.get(url, {'user__id__exact': 'bob'}), f'{url}?e=1', fetch_redirect_response=False)
+
+    def test_changelist_queries_do_not_grow_with_the_rows(self):
+        url = reverse('admin:myapp_todo_changelist')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(url)
+        for i in range(20):
+            Todo.objects.create(user=User.objects.create_user(f'user{i}', password='pw'), text=f'todo {i}')
+        cache.clear()
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as many:
+            self.client.get(url)
+        self.assertEqual(len(many), len(few))
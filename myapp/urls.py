@@ -1,14 +1,30 @@
+from django.conf import settings
 from django.urls import path
 from django.contrib.auth import views as auth_views
-from . import views
+from . import api, async_views, views
+
+# The task list views have async versions for ASGI deployments
+task_views = async_views if settings.TODO_ASYNC_VIEWS else views
 
 urlpatterns = [
     # Todo URLs
-    path('', views.home, name='home'),
+    path('', task_views.home, name='home'),
+    path('tasks/', task_views.task_page, name='task_page'),
     path('add/', views.add_todo, name='add_todo'),
     path('edit/<int:todo_id>/', views.edit_todo, name='edit_todo'),
-    path('toggle/<int:todo_id>/', views.toggle_todo, name='toggle_todo'),
-    path('delete/<int:todo_id>/', views.delete_todo, name='delete_todo'),
+    path('toggle/<int:todo_id>/', task_views.toggle_todo, name='toggle_todo'),
+    path('delete/<int:todo_id>/', task_views.delete_todo, name='delete_todo'),
+    path('events/', async_views.events, name='todo_events'),
+    
+    # JSON API
+    path('api/v1/todos/', api.todo_list, name='api_todo_list'),
+    path('api/v1/todos/suggest/', api.todo_suggest, name='api_todo_suggest'),
+    path('api/v1/todos/batch/', api.todo_batch, name='api_todo_batch'),
+    path('api/v1/todos/export/', api.todo_export, name='api_todo_export'),
+    path('api/v1/todos/import/', api.todo_import, name='api_todo_import'),
+    path('api/v1/todos/changes/', api.todo_changes, name='api_todo_changes'),
+    path('api/v1/todos/<int:todo_id>/', api.todo_detail, name='api_todo_detail'),
+    path('api/v1/todos/<int:todo_id>/toggle/', api.todo_toggle, name='api_todo_toggle'),
     
     # Authentication URLs
     path('login/', views.login_view, name='login'),
@@ -1,22 +1,173 @@
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import HttpResponse, JsonResponse
+from django.template.loader import render_to_string
+from django.middleware.csrf import get_token
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from django.http import Http404, HttpResponseBadRequest, JsonResponse
 from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.views import PasswordChangeView, PasswordResetView, PasswordResetConfirmView
 from django.contrib import messages
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 from django.utils import timezone
-from datetime import timedelta
-from .models import Todo
+from .models import Todo, TodoCounters
+from .caching import LazyTaskPage, get_cached_sidebar_counts, get_template_version, get_todo_version, make_key
+from .events import get_last_event_id, live_updates_available
+from .pagination import InvalidCursor, decode_cursor, keyset_page
+from .search import search_todos
 from .forms import TodoForm, CustomUserCreationForm, CustomAuthenticationForm, CustomPasswordChangeForm, CustomPasswordResetForm, UserProfileForm
 
 # Create your views here.
+# Largest page a client may request with ?limit=
+MAX_PAGE_SIZE = 200
+
+# Sidebar counter shown as the task total for each view
+VIEW_COUNT_KEYS = {
+    'upcoming': 'upcoming_count',
+    'completed': 'completed_count',
+    'missed': 'missed_count',
+}
+
+
+def is_ajax(request):
+    """True for fetch/XHR requests that want JSON instead of a redirect"""
+    return (
+        request.headers.get('x-requested-with') == 'XMLHttpRequest'
+        or 'application/json' in request.headers.get('accept', '')
+    )
+
+
+def get_sidebar_counts(user, today=None):
+    """Sidebar counts from the counter table, or one aggregate query if it is disabled"""
+    if settings.TODO_COUNTER_TABLE:
+        return TodoCounters.for_user(user, today)
+    return Todo.objects.filter(user=user).sidebar_counts(today)
+
+
+def get_task_list_params(request):
+    """Read the list filters shared by home() and the task page fragment"""
+    sort = request.GET.get('sort', '')
+    if sort not in Todo.SORT_ORDERINGS:
+        sort = ''
+    try:
+        page_size = min(max(int(request.GET.get('limit', '')), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        page_size = settings.TODO_PAGE_SIZE
+    return {
+        'search_query': request.GET.get('search', ''),
+        'category': request.GET.get('category', ''),
+        'view': request.GET.get('view', ''),
+        'sort': sort,
+        'page_size': page_size,
+        'cursor': request.GET.get('cursor', ''),
+    }
+
+
+def get_task_list_queryset(user, params, today, view, category):
+    user_todos = Todo.objects.filter(user=user)
+    if params['search_query']:
+        user_todos = search_todos(user_todos, params['search_query'])
+    return user_todos.for_view(view, category, today).with_bucket(today)
+
+
+def get_task_page(user, params, today, view, category, cursor=None):
+    """Return one keyset page of a task list as ``(todos, next_cursor)``"""
+    queryset = get_task_list_queryset(user, params, today, view, category)
+    return keyset_page(queryset, Todo.SORT_ORDERINGS[params['sort']], cursor, params['page_size'])
+
+
+def get_list_cache_key(request, version, today):
+    # Rendered task sections are cached per user, data version and query. The
+    # rows contain CSRF tokens, so the key also varies on this browser's secret.
+    get_token(request)
+    return make_key(version, today, request.GET.urlencode(), request.META.get('CSRF_COOKIE', ''))
+
+
+def get_home_counts(user, search_query, today, version):
+    """Cached sidebar counts for home(); search results are always counted with one aggregate query"""
+    def compute_counts():
+        if search_query:
+            return search_todos(Todo.objects.filter(user=user), search_query).sidebar_counts(today)
+        return get_sidebar_counts(user, today)
+    
+    return get_cached_sidebar_counts(user, version, today, search_query, compute_counts)
+
+
+def get_home_context(request, params, form, today, version, sidebar_counts, current_page, overdue_page):
+    """Template context for home(), shared with the async view"""
+    category = params['category']
+    view = params['view']
+    if category:
+        current_count = sidebar_counts.get(f'{category}_count', 0)
+    else:
+        current_count = sidebar_counts[VIEW_COUNT_KEYS.get(view, 'today_count')]
+    
+    # Query strings for the "Show more" links, without the cursor
+    page_query = request.GET.copy()
+    page_query.pop('cursor', None)
+    overdue_query = page_query.copy()
+    overdue_query['view'] = 'missed'
+    
+    # The live-update stream starts after the last change this page includes
+    events_url = ''
+    if live_updates_available(request):
+        events_url = f"{reverse('todo_events')}?last_event_id={get_last_event_id(request.user.pk)}"
+    
+    return {
+        'form': form,
+        'overdue_page': overdue_page,
+        'overdue_query': overdue_query.urlencode(),
+        'current_page': current_page,
+        'current_count': current_count,
+        'page_query': page_query.urlencode(),
+        'search_query': params['search_query'],
+        'category': category,
+        'view': view,
+        'sort': params['sort'],
+        'today_date': today,
+        'todo_version': version,
+        'list_cache_key': get_list_cache_key(request, version, today),
+        'fragment_cache_timeout': settings.TODO_FRAGMENT_CACHE_TIMEOUT,
+        'events_url': events_url,
+        **sidebar_counts,
+    }
+
+
+def home_etag(request):
+    """Validator for home(), computed before any task list is built"""
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    # Pending flash messages are rendered into the page, so never answer 304
+    if len(messages.get_messages(request)):
+        return None
+    user = request.user
+    # Forms in the page carry tokens for this browser's CSRF secret. Make sure it
+    # exists now, or a first visit without the cookie would be tagged with no
+    # secret and its first revalidation could never match
+    get_token(request)
+    parts = [
+        Todo.objects.filter(user=user).data_version(),
+        user.username,
+        user.first_name,
+        user.email,
+        request.GET.urlencode(),
+        # Tasks move between Today/Upcoming/Missed at midnight
+        timezone.now().date().isoformat(),
+        request.META['CSRF_COOKIE'],
+        get_template_version(),
+    ]
+    return '"%s"' % make_key(*parts)
+
+
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=home_etag)
 def home(request):
     form = TodoForm()
-    search_query = request.GET.get('search', '')
-    category = request.GET.get('category', '')
-    view = request.GET.get('view', '')
+    params = get_task_list_params(request)
+    category = params['category']
+    view = params['view']
     
     if request.method == 'POST':
         form = TodoForm(request.POST)
@@ -27,63 +178,52 @@ def home(request):
             messages.success(request, f'Task "{todo.text}" created successfully!')
             return redirect('home')
     
-    # Get user's todos
-    user_todos = Todo.objects.filter(user=request.user)
+    # Reject bad cursors up front, since the pages below are only loaded on a cache miss
+    if params['cursor']:
+        try:
+            decode_cursor(Todo, Todo.SORT_ORDERINGS[params['sort']], params['cursor'])
+        except InvalidCursor:
+            return HttpResponseBadRequest('Invalid cursor.')
     
-    # Apply search filter if search query exists
-    if search_query:
-        user_todos = user_todos.filter(text__icontains=search_query)
-    
-    # Organize todos by date
+    # Only the first page of each list is rendered; the rest is loaded on scroll
     today = timezone.now().date()
-    tomorrow = today + timedelta(days=1)
+    current_page = LazyTaskPage(
+        lambda: get_task_page(request.user, params, today, view, category, params['cursor'])
+    )
     
-    today_todos = user_todos.filter(due_date=today) | user_todos.filter(due_date__isnull=True, created_at__date=today)
-    tomorrow_todos = user_todos.filter(due_date=tomorrow)
-    upcoming_todos = user_todos.filter(due_date__gt=tomorrow)
-    overdue_todos = user_todos.filter(due_date__lt=today, completed=False)
-    completed_todos = user_todos.filter(completed=True)
+    # Overdue tasks are shown under the default view only
+    overdue_page = None
+    if not category and not view:
+        overdue_page = LazyTaskPage(lambda: get_task_page(request.user, params, today, 'missed', ''))
     
-    # Category filtering
-    if category:
-        current_todos = user_todos.filter(category=category)
-    elif view == 'upcoming':
-        current_todos = upcoming_todos
-    elif view == 'today':
-        current_todos = today_todos
-    elif view == 'completed':
-        current_todos = completed_todos
-    elif view == 'missed':
-        current_todos = overdue_todos  # Missed tasks are overdue incomplete tasks
-    else:
-        current_todos = today_todos
+    version = get_todo_version(request.user.pk)
+    sidebar_counts = get_home_counts(request.user, params['search_query'], today, version)
     
-    # Get counts for sidebar
-    personal_count = user_todos.filter(category='personal').count()
-    work_count = user_todos.filter(category='work').count()
-    home_count = user_todos.filter(category='home').count()
-    completed_count = user_todos.filter(completed=True).count()
-    missed_count = user_todos.filter(due_date__lt=today, completed=False).count()
+    context = get_home_context(request, params, form, today, version, sidebar_counts, current_page, overdue_page)
+    return render(request, 'myapp/index_new.html', context)
+
+
+@login_required
+def task_page(request):
+    """Render the next page of task rows for infinite scrolling"""
+    params = get_task_list_params(request)
+    overdue = request.GET.get('section') == 'overdue'
+    view = 'missed' if overdue else params['view']
+    category = '' if overdue else params['category']
+    today = timezone.now().date()
+    try:
+        todos, next_cursor = get_task_page(request.user, params, today, view, category, params['cursor'])
+    except InvalidCursor:
+        return HttpResponseBadRequest('Invalid cursor.')
     
-    context = {
-        'form': form,
-        'today_todos': today_todos,
-        'tomorrow_todos': tomorrow_todos,
-        'upcoming_todos': upcoming_todos,
-        'overdue_todos': overdue_todos,
-        'completed_todos': completed_todos,
-        'current_todos': current_todos,
-        'search_query': search_query,
-        'category': category,
-        'view': view,
+    response = render(request, 'myapp/partials/task_page.html', {
+        'todos': todos,
+        'overdue': overdue,
         'today_date': today,
-        'personal_count': personal_count,
-        'work_count': work_count,
-        'home_count': home_count,
-        'completed_count': completed_count,
-        'missed_count': missed_count,
-    }
-    return render(request, 'myapp/index_new.html', context)
+    })
+    if next_cursor:
+        response['X-Next-Cursor'] = next_cursor
+    return response
 
 def register_view(request):
     if request.method == 'POST':
@@ -170,9 +310,15 @@ def add_todo(request):
 @login_required
 def toggle_todo(request, todo_id):
     if request.method == 'POST':
-        todo = get_object_or_404(Todo, id=todo_id, user=request.user) if hasattr(Todo, 'user') else get_object_or_404(Todo, id=todo_id)
-        todo.completed = not todo.completed
-        todo.save()
+        if not Todo.objects.toggle_completed(todo_id, request.user):
+            raise Http404('No Todo matches the given query.')
+        todo = Todo.objects.only('id', 'text', 'completed').get(id=todo_id)
+        if is_ajax(request):
+            return JsonResponse({
+                'id': todo.id,
+                'completed': todo.completed,
+                'counts': get_sidebar_counts(request.user),
+            })
         status = "completed" if todo.completed else "marked as pending"
         messages.success(request, f'Task "{todo.text}" {status}!')
     return redirect('home')
@@ -185,8 +331,20 @@ def edit_todo(request, todo_id):
         form = TodoForm(request.POST, instance=todo)
         if form.is_valid():
             form.save()
+            if is_ajax(request):
+                html = render_to_string('myapp/partials/task_item.html', {
+                    'todo': todo,
+                    'today_date': timezone.now().date(),
+                }, request=request)
+                return JsonResponse({
+                    'id': todo.id,
+                    'html': html,
+                    'counts': get_sidebar_counts(request.user),
+                })
             messages.success(request, f'Task updated successfully!')
             return redirect('home')
+        if is_ajax(request):
+            return JsonResponse({'errors': form.errors}, status=400)
     else:
         form = TodoForm(instance=todo)
     
@@ -202,5 +360,11 @@ def delete_todo(request, todo_id):
     if request.method == 'POST':
         todo = get_object_or_404(Todo, id=todo_id, user=request.user)
         todo.delete()
+        if is_ajax(request):
+            return JsonResponse({
+                'id': todo_id,
+                'deleted': True,
+                'counts': get_sidebar_counts(request.user),
+            })
         messages.success(request, f'Task "{todo.text}" deleted successfully!')
-    return redirect('home')
\ No newline at end of file
+    return redirect('home')